@@ -10,14 +10,43 @@ University of Toronto
 
 This file contains the Block class, the main data structure used in the game.
 """
-from typing import Optional, Tuple, List
+from typing import Dict, Iterator, Optional, Tuple, List
+import itertools
 import random
-from app.renderer import COLOUR_LIST, TEMPTING_TURQUOISE, BLACK, colour_name
+import numpy as np
+from app.palette import COLOUR_LIST, TEMPTING_TURQUOISE, BLACK, colour_name
 
 
 HIGHLIGHT_COLOUR = TEMPTING_TURQUOISE
 FRAME_COLOUR = BLACK
 
+# The index of each colour in COLOUR_LIST, as stored by Block.flatten_array.
+COLOUR_INDEX = {colour: i for i, colour in enumerate(COLOUR_LIST)}
+
+# The new order of the children of a Block after rotate or swap in each
+# direction, expressed as indices into the old list of children.
+ROTATIONS = {1: (1, 2, 3, 0), 3: (3, 0, 1, 2)}
+SWAPS = {0: (1, 0, 3, 2), 1: (3, 2, 1, 0)}
+
+# The index in Block.children of the child in each quadrant, indexed first
+# by whether the quadrant is the lower one and then by whether it is the
+# right one.
+_CHILD_AT = ((1, 0), (2, 3))
+
+# Random 64-bit keys for board hashing: one per colour in COLOUR_LIST, used
+# for leaves, and one per child index, used to mix the hashes of children
+# into the hash of their parent.  They are drawn from a fixed seed so that
+# hashes are stable across processes.
+_HASH_MASK = (1 << 64) - 1
+_key_source = random.Random(0xB10C)
+_COLOUR_KEYS = {colour: _key_source.getrandbits(64) for colour in COLOUR_LIST}
+_CHILD_KEYS = tuple(_key_source.getrandbits(64) for _ in range(4))
+del _key_source
+
+# The source of layout generations.  Every change to a tree stamps its root
+# with a new generation, which is unique across all trees.
+_generations = itertools.count(1)
+
 
 class Block:
     """A square block in the Blocky game.
@@ -71,29 +100,159 @@ class Block:
     children: List['Block']
     parent: Optional['Block']
 
+    # === Private Attributes ===
+    # _flattened:
+    #     The memoized result of flatten for this Block, or None if it has
+    #     not been computed since this Block or one of its descendants last
+    #     changed.
+    # _position, _size:
+    #     The last computed position and size of this Block.  They are only
+    #     current if _layout is the _generation of the root of the tree.
+    # _layout:
+    #     The layout generation in which _position and _size were computed.
+    # _generation:
+    #     If this Block is the root of its tree, the current layout
+    #     generation of the tree.  Unused otherwise.
+    # _hash:
+    #     The board hash of this Block, as returned by board_hash.
+    # _highlighted:
+    #     The value of the highlighted attribute.
+    # _rectangles:
+    #     The memoized result of rectangles_to_draw together with the
+    #     position and size this Block had when it was computed, or None if
+    #     this Block, its highlighting or its descendants changed since.
+    # _summaries:
+    #     The memoized results of blob_summary, by colour, for the current
+    #     contents of this Block.
+    _flattened: Optional[List[List[Tuple[int, int, int]]]]
+    _position: Tuple[int, int]
+    _size: int
+    _layout: int
+    _generation: int
+    _hash: int
+    _highlighted: bool
+    _rectangles: Optional[Tuple[Tuple[int, int], int, List[Tuple]]]
+    _summaries: Dict[Tuple[int, int, int], 'BlobSummary']
+
     def __init__(self, level: int,
                  colour: Optional[Tuple[int, int, int]] = None,
                  children: Optional[List['Block']] = None) -> None:
         
-        self.position = (0,0)
-        self.size = 0
+        self._position = (0, 0)
+        self._size = 0
+        self._layout = 0
+        self._generation = next(_generations)
         self.level = level
         self.max_depth = 0
-        self.highlighted = False
         self.parent = None
+        self._highlighted = False
+        self._flattened = None
+        self._rectangles = None
+        self._summaries = {}
 
         if children is not None:
             self.children = children
             self.colour = None
+            # Los hijos ya conocen la profundidad máxima del árbol.
+            self.max_depth = max(child.max_depth for child in children)
             for child in self.children:
                 child. parent = self
                 child.level = level + 1
-                child.max_depth = self.max_depth
 
         else:
             self.children = []
             self.colour = colour
+        self._rehash()
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        """The (x, y) coordinates of the upper left corner of this Block.
+        """
+        self._refresh_geometry()
+        return self._position
+
+    @position.setter
+    def position(self, value: Tuple[int, int]) -> None:
+        self._position = value
+        self._layout = self._root()._generation
+
+    @property
+    def size(self) -> int:
+        """The height and width of this Block.
+        """
+        self._refresh_geometry()
+        return self._size
 
+    @size.setter
+    def size(self, value: int) -> None:
+        self._size = value
+        self._layout = self._root()._generation
+
+    @property
+    def highlighted(self) -> bool:
+        """True iff the user has selected this block for action.
+        """
+        return self._highlighted
+
+    @highlighted.setter
+    def highlighted(self, value: bool) -> None:
+        if value == self._highlighted:
+            return
+        self._highlighted = value
+        block = self
+        while block is not None:
+            block._rectangles = None
+            block = block.parent
+
+    def _root(self) -> 'Block':
+        """Return the top-level Block of the tree containing this Block.
+        """
+        block = self
+        while block.parent is not None:
+            block = block.parent
+        return block
+
+    def _refresh_geometry(self) -> None:
+        """Recompute the position and size of this Block, if the tree has
+        been changed since they were computed.
+
+        Geometry is derived from the root's position and size and from the
+        index of each Block among its parent's children, as required by the
+        representation invariants.  The highest out-of-date Block on the
+        path from this Block to the root is laid out again together with its
+        whole subtree, in one top-down pass, so reading the geometry of the
+        other Blocks of that subtree next, as a walk over the tree does,
+        only costs finding the root.
+        """
+        root = self._root()
+        generation = root._generation
+        if self is root or self._layout == generation:
+            return
+        top = self
+        while top.parent is not root and top.parent._layout != generation:
+            top = top.parent
+
+        parent = top.parent
+        x, y = parent._position
+        half = parent._size // 2
+        index = parent.children.index(top)
+        top._position = (x + half * (index in (0, 3)),
+                         y + half * (index in (2, 3)))
+        top._size = half
+        stack = [top]
+        while stack:
+            block = stack.pop()
+            block._layout = generation
+            if not block.children:
+                continue
+            x, y = block._position
+            half = block._size // 2
+            offsets = [(x + half, y), (x, y), (x, y + half),
+                       (x + half, y + half)]
+            for child, offset in zip(block.children, offsets):
+                child._position = offset
+                child._size = half
+                stack.append(child)
 
     def rectangles_to_draw(self) -> List[Tuple[Tuple[int, int, int],
                                         Tuple[int, int],
@@ -124,28 +283,74 @@ class Block:
         the outline.
 
         The order of the rectangles does not matter.
+
+        The list of each subtree is memoized until that subtree, its
+        highlighting or its geometry changes, so drawing a board that has
+        not changed only copies the memoized list.
+        """
+        return list(self._draw_list(self.position, self.size))
+
+    def _draw_list(self, position: Tuple[int, int],
+                   size: int) -> List[Tuple[Tuple[int, int, int],
+                                             Tuple[int, int],
+                                             Tuple[int, int],
+                                             int]]:
+        """Return the memoized result of rectangles_to_draw for this Block
+        placed at <position> with <size>, which is shared with the memoized
+        lists of the ancestors of this Block and must not be mutated.
+
+        The geometry of each child is derived from <position> and <size> on
+        the way down, as in iter_rectangles, so the lazy position and size
+        of the Blocks visited are never read.
         """
+        cached = self._rectangles
+        if cached is not None and cached[0] == position and cached[1] == size:
+            return cached[2]
+
         rectangles = []
 
         if not self.children:
-            rectangles.append(
-                (self.colour, self.position, (self.size, self.size), 0)
-            )
-
-            rectangles.append(
-                (FRAME_COLOUR, self.position, (self.size, self.size), 3)
-            )
+            rectangles.append((self.colour, position, (size, size), 0))
+            rectangles.append((FRAME_COLOUR, position, (size, size), 3))
         else:
-            for child in self.children:
-                rectangles.extend(child.rectangles_to_draw())
+            x, y = position
+            half = size // 2
+            offsets = [(x + half, y), (x, y), (x, y + half),
+                       (x + half, y + half)]
+            for child, offset in zip(self.children, offsets):
+                rectangles.extend(child._draw_list(offset, half))
 
         if self.highlighted:
-            rectangles.append(
-                (HIGHLIGHT_COLOUR, self.position, (self.size, self.size), 5)
-            )
+            rectangles.append((HIGHLIGHT_COLOUR, position, (size, size), 5))
 
+        self._rectangles = (position, size, rectangles)
         return rectangles
 
+    def iter_rectangles(self) -> Iterator[Tuple[Tuple[int, int, int],
+                                                Tuple[int, int],
+                                                Tuple[int, int],
+                                                int]]:
+        """Yield the rectangles described in rectangles_to_draw, one at a
+        time, without building any intermediate list.
+
+        Positions and sizes are computed on the way down from those of this
+        Block, so the Blocks visited need not have up-to-date geometry.
+        """
+        stack = [(self, self.position, self.size)]
+        while stack:
+            block, (x, y), size = stack.pop()
+            if block.children:
+                half = size // 2
+                stack.append((block.children[0], (x + half, y), half))
+                stack.append((block.children[1], (x, y), half))
+                stack.append((block.children[2], (x, y + half), half))
+                stack.append((block.children[3], (x + half, y + half), half))
+            else:
+                yield block.colour, (x, y), (size, size), 0
+                yield FRAME_COLOUR, (x, y), (size, size), 3
+            if block.highlighted:
+                yield HIGHLIGHT_COLOUR, (x, y), (size, size), 5
+
     def swap(self, direction: int) -> None:
         """Swap the child Blocks of this Block.
 
@@ -163,7 +368,7 @@ class Block:
             self.children[0], self.children[3] = self.children[3], self.children[0]
             self.children[1], self.children[2] = self.children[2], self.children[1]
 
-        self.update_block_locations(self.position, self.size)
+        self._invalidate()
 
     def rotate(self, direction: int) -> None:
         """Rota este Bloque y todos sus descendientes.
@@ -179,10 +384,10 @@ class Block:
         elif direction == 3:
             self.children = [self.children[3], self.children[0], self.children[1], self.children[2]]
 
-        self.update_block_locations(self.position, self.size)
+        self._invalidate()
 
 
-    def smash(self) -> bool:
+    def smash(self, rng: Optional[random.Random] = None) -> bool:
         """Destruye este bloque.
 
         Si este Bloque puede ser destruido,
@@ -195,17 +400,78 @@ class Block:
 
         Devuelve True si este Bloque fue destruido y False en caso contrario.
 
+        Los nuevos hijos se generan con <rng>, o con el módulo random si es
+        None.
         """
         if self.level == 0 or self.level == self.max_depth:
             return False
-        self.children = [random_init(self.level + 1, self.max_depth) for _ in range(4)]
+        self.replace_contents(None, [random_init(self.level + 1, self.max_depth,
+                                                 rng)
+                                     for _ in range(4)])
+        return True
+
+    def replace_contents(self, colour: Optional[Tuple[int, int, int]],
+                         children: List['Block']) -> None:
+        """Make this Block subdivided into <children>, or, if <children> is
+        empty, undivided with <colour>.
+
+        Any children this Block had before are discarded.
+
+        Precondition: len(children) == 0 or len(children) == 4, and the
+        level of each child is one greater than that of this Block.
+        """
+        self.children = list(children)
+        self.colour = None if self.children else colour
         for child in self.children:
             child.parent = self
             child.max_depth = self.max_depth
-        self.colour = None
-        self.update_block_locations(self.position, self.size)
-        return True
+        self._invalidate()
+
+    def _invalidate(self) -> 'Block':
+        """Discard the memoized state of this Block and of every ancestor of
+        this Block, since their contents changed, and return the root.
 
+        Only the path from this Block up to the root is touched; the caches
+        of unaffected subtrees remain valid.  The root is stamped with a new
+        layout generation, so positions and sizes are recomputed lazily the
+        next time they are read.
+        """
+        block = self
+        while True:
+            block._flattened = None
+            block._rectangles = None
+            block._summaries.clear()
+            block._rehash()
+            if block.parent is None:
+                block._generation = next(_generations)
+                return block
+            block = block.parent
+
+
+    def board_hash(self) -> int:
+        """Return a 64-bit hash of the structure and colours of this Block.
+
+        Blocks that are subdivided in the same way and whose leaves have the
+        same colours have the same hash, whatever their level, position or
+        size, and other blocks almost always hash differently.  The hash is
+        kept up to date as the tree changes, so this takes constant time.
+        """
+        return self._hash
+
+    def _rehash(self) -> None:
+        """Recompute the board hash of this Block from its colour or from
+        the hashes of its children.
+
+        A leaf hashes to the random key of its colour.  A subdivided Block
+        XORs one value per child, the splitmix64 finalizer applied to that
+        child's hash XORed with the key of the child's index, so the hash
+        depends on where every leaf is.
+        """
+        if self.children:
+            self._hash = combine_hashes(
+                [child._hash for child in self.children])
+        else:
+            self._hash = colour_hash(self.colour)
 
     def update_block_locations(self, top_left: Tuple[int, int], size: int) -> None:
         """
@@ -216,44 +482,118 @@ class Block:
         <top_left> son las coordenadas (x, y) de la esquina superior izquierda de este bloque. <size> es la altura
 
         y el ancho de este bloque.
-        """
 
-        self.position = top_left
-        self.size = size
-        if len(self.children):
-            x, y = top_left
-            child_size = size // 2
-            positions = [
-                (x + child_size, y),
-                (x, y),
-                (x, y + child_size),
-                (x + child_size, y + child_size)
-            ]
-            for i in range(4):
-                self.children[i].update_block_locations(positions[i], child_size)
+        Las posiciones de los bloques internos se recalculan de forma perezosa,
+        la próxima vez que se consultan.
+        """
+        root = self._invalidate()
+        self._position = top_left
+        self._size = size
+        self._layout = root._generation
 
     def get_selected_block(self, location: Tuple[int, int], level: int) -> "Block":
         """
         Su objetivo es encontrar el bloque que contenga ese punto y esté en el nivel especificado.
         Si no existe un bloque exactamente en ese nivel, devuelve el bloque más cercano en profundidad que contiene el punto.
 
+        En cada nivel, el hijo que contiene el punto se calcula directamente a
+        partir de su desplazamiento respecto al punto medio del bloque.
         """
         x, y = location
+        left, top = self.position
+        size = self.size
 
-        if not (self.position[0] <= x < self.position[0] + self.size and
-                self.position[1] <= y < self.position[1] + self.size):
-            return self
-
-        if self.level == level or not self.children:
+        if not (left <= x < left + size and top <= y < top + size):
             return self
 
-        for child in self.children:
-            if (child.position[0] <= x < child.position[0] + child.size and
-                    child.position[1] <= y < child.position[1] + child.size):
-                return child.get_selected_block(location, level)
-
-        return self
-
+        block = self
+        while block.level != level and block.children:
+            half = size // 2
+            dx, dy = x - left, y - top
+            # Con tamaños impares, el último píxel no pertenece a ningún hijo
+            if dx >= 2 * half or dy >= 2 * half:
+                break
+            right = dx >= half
+            bottom = dy >= half
+            block = block.children[_CHILD_AT[bottom][right]]
+            left += half * right
+            top += half * bottom
+            size = half
+        return block
+
+    def get_selected_blocks(self, queries: List[Tuple[Tuple[int, int], int]]
+                            ) -> List['Block']:
+        """Return the result of get_selected_block(location, level) for each
+        (location, level) pair in <queries>, in order.
+
+        The unit cell under every location is computed for all queries at
+        once, and looked up in an index of the leaves of this Block, so
+        answering many queries is much faster than calling
+        get_selected_block for each of them.
+        """
+        if not queries:
+            return []
+        leaves, index = self._leaf_index()
+        left, top = self.position
+        size = self.size
+        dx = np.array([location[0] for location, _ in queries]) - left
+        dy = np.array([location[1] for location, _ in queries]) - top
+        inside = (dx >= 0) & (dx < size) & (dy >= 0) & (dy < size)
+
+        # Descend one level at a time for every query, tracking the column
+        # and row of the unit cell reached and the first level at which the
+        # location fell outside every child.
+        column = np.zeros(len(queries), dtype=np.int64)
+        row = np.zeros(len(queries), dtype=np.int64)
+        stop = np.full(len(queries), self.max_depth)
+        for level in range(self.level, self.max_depth):
+            half = size // 2
+            in_gap = (dx >= 2 * half) | (dy >= 2 * half)
+            stop = np.where(in_gap & (stop == self.max_depth), level, stop)
+            right = dx >= half
+            bottom = dy >= half
+            dx = dx - half * right
+            dy = dy - half * bottom
+            column = column * 2 + right
+            row = row * 2 + bottom
+            size = half
+
+        results = []
+        leaf_ids = index[column, row].tolist()
+        for (_, level), leaf_id, stop_level, is_inside in zip(
+                queries, leaf_ids, stop.tolist(), inside.tolist()):
+            if not is_inside:
+                results.append(self)
+                continue
+            if level < self.level:
+                level = self.max_depth
+            block = leaves[leaf_id]
+            while block.level > min(level, stop_level):
+                block = block.parent
+            results.append(block)
+        return results
+
+    def _leaf_index(self) -> Tuple[List['Block'], np.ndarray]:
+        """Return the leaves of this Block together with a square array, laid
+        out like flatten_array, holding the position in that list of the
+        leaf that covers each unit cell.
+        """
+        size = 2 ** (self.max_depth - self.level)
+        leaves = []
+        index = np.zeros((size, size), dtype=np.int32)
+        stack = [(self, 0, 0, size)]
+        while stack:
+            block, x, y, size = stack.pop()
+            if not block.children:
+                index[x:x + size, y:y + size] = len(leaves)
+                leaves.append(block)
+                continue
+            half = size // 2
+            offsets = [(x + half, y), (x, y), (x, y + half),
+                       (x + half, y + half)]
+            for child, (child_x, child_y) in zip(block.children, offsets):
+                stack.append((child, child_x, child_y, half))
+        return leaves, index
 
     def flatten(self) -> List[List[Tuple[int, int, int]]]:
         """Devuelve una lista bidimensional que representa este Bloque como filas
@@ -268,19 +608,32 @@ class Block:
 
         L[0][0] representa la celda unitaria en la esquina superior izquierda del Bloque.
         """
+        return [column[:] for column in self._flatten_grid()]
+
+    def _flatten_grid(self) -> List[List[Tuple[int, int, int]]]:
+        """Return the flattened form of this Block, as described in flatten.
+
+        The result is memoized in _flattened until this Block or one of its
+        descendants is mutated, and is shared with the caches of the
+        ancestors of this Block, so it must not be mutated.
+        """
+        if self._flattened is not None:
+            return self._flattened
+
         size = int(2 ** (self.max_depth - self.level))
 
         # Si el bloque es una hoja (sin hijos), retorna una matriz de su color
         if not self.children:
-            return [[self.colour for _ in range(size)] for _ in range(size)]
+            self._flattened = [[self.colour] * size for _ in range(size)]
+            return self._flattened
 
         child_size = size // 2
 
-        # Obtenemos los cuadrantes
-        superior_izquierdo = self.children[1].flatten()
-        superior_derecho = self.children[2].flatten()
-        inferior_izquierdo = self.children[0].flatten()
-        inferior_derecho = self.children[3].flatten()
+        # Obtenemos los cuadrantes (ya memorizados si no cambiaron)
+        superior_derecho = self.children[0]._flatten_grid()
+        superior_izquierdo = self.children[1]._flatten_grid()
+        inferior_izquierdo = self.children[2]._flatten_grid()
+        inferior_derecho = self.children[3]._flatten_grid()
 
         # Verificamos que todos los cuadrantes tienen el tamaño correcto
         expected_size = child_size
@@ -291,27 +644,236 @@ class Block:
             # Si algún cuadrante no tiene el tamaño esperado, creamos una matriz en negro como fallback
             return [[(0, 0, 0) for _ in range(size)] for _ in range(size)]
 
-        # Combinamos los cuadrantes
-        resultado = []
+        # Combinamos los cuadrantes: las columnas de la mitad izquierda y
+        # luego las de la mitad derecha
+        resultado = [superior_izquierdo[i] + inferior_izquierdo[i]
+                     for i in range(child_size)]
+        resultado.extend(superior_derecho[i] + inferior_derecho[i]
+                         for i in range(child_size))
+
+        self._flattened = resultado
+        return resultado
+
+    def blob_summary(self, colour: Tuple[int, int, int]) -> 'BlobSummary':
+        """Return the BlobSummary of the cells of <colour> within this Block.
 
+        Summaries are built from those of the children and memoized until
+        this Block or one of its descendants is mutated, so this takes time
+        proportional to the number of leaves and edge runs, not of cells.
+        The result is shared with the caches and must not be mutated.
+        """
+        summary = self._summaries.get(colour)
+        if summary is None:
+            if self.children:
+                summary = BlobSummary.merge(
+                    [child.blob_summary(colour) for child in self.children])
+            else:
+                summary = BlobSummary.leaf(
+                    2 ** (self.max_depth - self.level), self.colour == colour)
+            self._summaries[colour] = summary
+        return summary
+
+    def flatten_array(self) -> np.ndarray:
+        """Return this Block as a square array of unit cells.
+
+        The result A has shape (2^{max_depth - self.level},) * 2, dtype uint8,
+        and A[i, j] is the index in COLOUR_LIST of the colour of the unit cell
+        in column i and row j, so it is laid out like the result of flatten.
+
+        Raise a ValueError if this Block contains a colour that is not in
+        COLOUR_LIST.
+        """
+        size = 2 ** (self.max_depth - self.level)
+        grid = np.zeros((size, size), dtype=np.uint8)
+        self._fill_array(grid, 0, 0, size)
+        return grid
+
+    def _fill_array(self, grid: np.ndarray, x: int, y: int, size: int) -> None:
+        """Write the colour indices of this Block into the <size> by <size>
+        square of <grid> whose upper-left cell is in column <x> and row <y>.
+        """
+        if not self.children:
+            if self.colour not in COLOUR_INDEX:
+                raise ValueError(f'colour {self.colour} is not in COLOUR_LIST')
+            grid[x:x + size, y:y + size] = COLOUR_INDEX[self.colour]
+            return
 
-        for i in range(child_size):
-            fila_superior = []
-            fila_superior.extend(superior_izquierdo[i])
-            fila_superior.extend(superior_derecho[i])
-            resultado.append(fila_superior)
+        half = size // 2
+        offsets = [(x + half, y), (x, y), (x, y + half), (x + half, y + half)]
+        for child, (child_x, child_y) in zip(self.children, offsets):
+            child._fill_array(grid, child_x, child_y, half)
 
 
-        for i in range(child_size):
-            fila_inferior = []
-            fila_inferior.extend(inferior_izquierdo[i])
-            fila_inferior.extend(inferior_derecho[i])
-            resultado.append(fila_inferior)
+# The edges of a block, in the order of BlobSummary.edges.
+TOP, RIGHT, BOTTOM, LEFT = range(4)
 
-        return resultado
+Run = Tuple[int, int, int]
+
+
+class BlobSummary:
+    """The blobs of one colour within a block, reduced to what matters for
+    finding blobs in the blocks around it.
 
+    A blob is a connected group of unit cells of the colour, where cells are
+    connected if their sides touch.  Blobs that touch an edge of the block
+    are open, since they may grow across that edge; the others are closed
+    and only their largest size is kept.
 
-def random_init(level: int, max_depth: int) -> 'Block':
+    === Public Attributes ===
+    size:
+        The height and width of the block, in unit cells.
+    edges:
+        The runs of cells of the colour along the top, right, bottom and
+        left edges of the block, in that order.  Each run is a tuple
+        (start, end, blob) covering the cells at offsets start to end - 1
+        from the left or top end of the edge, all belonging to open blob
+        number <blob>.  The runs of an edge are sorted and disjoint.
+    open_sizes:
+        The size, in unit cells, of each open blob.
+    closed_size:
+        The size of the largest closed blob, or 0 if there is none.
+    """
+    __slots__ = ('size', 'edges', 'open_sizes', 'closed_size')
+    size: int
+    edges: Tuple[List[Run], List[Run], List[Run], List[Run]]
+    open_sizes: List[int]
+    closed_size: int
+
+    def __init__(self, size: int,
+                 edges: Tuple[List[Run], List[Run], List[Run], List[Run]],
+                 open_sizes: List[int], closed_size: int) -> None:
+        """Initialize this summary with the given attributes.
+        """
+        self.size = size
+        self.edges = edges
+        self.open_sizes = open_sizes
+        self.closed_size = closed_size
+
+    @classmethod
+    def leaf(cls, size: int, filled: bool) -> 'BlobSummary':
+        """Return the summary of an undivided block of <size> unit cells
+        across, which is entirely of the colour iff <filled>.
+        """
+        if not filled:
+            return cls(size, ([], [], [], []), [], 0)
+        return cls(size, tuple([(0, size, 0)] for _ in range(4)),
+                   [size * size], 0)
+
+    def largest(self) -> int:
+        """Return the size of the largest blob in the block.
+        """
+        return max(self.closed_size, max(self.open_sizes, default=0))
+
+    @staticmethod
+    def merge(children: List['BlobSummary']) -> 'BlobSummary':
+        """Return the summary of a block whose children, in the
+        Block.children order, have the summaries <children>.
+
+        Open blobs of neighbouring children are joined with a union-find
+        wherever their runs face each other across the shared edges.
+        """
+        upper_right, upper_left, lower_left, lower_right = children
+        half = upper_left.size
+        # The children in reading order, with the number of the first of
+        # their open blobs in the union-find.
+        quadrants = (upper_left, upper_right, lower_left, lower_right)
+        first = []
+        total = 0
+        for summary in quadrants:
+            first.append(total)
+            total += len(summary.open_sizes)
+        parent = list(range(total))
+
+        def find(blob: int) -> int:
+            while parent[blob] != blob:
+                parent[blob] = parent[parent[blob]]
+                blob = parent[blob]
+            return blob
+
+        def join(runs_a: List[Run], a: int, runs_b: List[Run], b: int) -> None:
+            i = j = 0
+            while i < len(runs_a) and j < len(runs_b):
+                start_a, end_a, blob_a = runs_a[i]
+                start_b, end_b, blob_b = runs_b[j]
+                if start_a < end_b and start_b < end_a:
+                    parent[find(first[a] + blob_a)] = find(first[b] + blob_b)
+                if end_a < end_b:
+                    i += 1
+                else:
+                    j += 1
+
+        join(upper_left.edges[RIGHT], 0, upper_right.edges[LEFT], 1)
+        join(lower_left.edges[RIGHT], 2, lower_right.edges[LEFT], 3)
+        join(upper_left.edges[BOTTOM], 0, lower_left.edges[TOP], 2)
+        join(upper_right.edges[BOTTOM], 1, lower_right.edges[TOP], 3)
+
+        sizes = [0] * total
+        for q, summary in enumerate(quadrants):
+            for blob, blob_size in enumerate(summary.open_sizes):
+                sizes[find(first[q] + blob)] += blob_size
+
+        # Renumber the blobs that are still open, in order of appearance.
+        number = {}
+
+        def outer(*parts: Tuple[int, int, int]) -> List[Run]:
+            runs = []
+            for q, edge, offset in parts:
+                for start, end, blob in quadrants[q].edges[edge]:
+                    root = find(first[q] + blob)
+                    if root not in number:
+                        number[root] = len(number)
+                    blob = number[root]
+                    start += offset
+                    end += offset
+                    if runs and runs[-1][1] == start and runs[-1][2] == blob:
+                        start = runs.pop()[0]
+                    runs.append((start, end, blob))
+            return runs
+
+        edges = (outer((0, TOP, 0), (1, TOP, half)),
+                 outer((1, RIGHT, 0), (3, RIGHT, half)),
+                 outer((2, BOTTOM, 0), (3, BOTTOM, half)),
+                 outer((0, LEFT, 0), (2, LEFT, half)))
+        open_sizes = [0] * len(number)
+        for root, blob in number.items():
+            open_sizes[blob] = sizes[root]
+        closed_size = max(summary.closed_size for summary in quadrants)
+        for blob in range(total):
+            if parent[blob] == blob and blob not in number:
+                closed_size = max(closed_size, sizes[blob])
+        return BlobSummary(2 * half, edges, open_sizes, closed_size)
+
+
+def _mix(value: int) -> int:
+    """Return a well-scrambled 64-bit value derived from <value>, using
+    the splitmix64 finalizer.
+    """
+    value &= _HASH_MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _HASH_MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _HASH_MASK
+    return value ^ (value >> 31)
+
+
+def colour_hash(colour: Optional[Tuple[int, int, int]]) -> int:
+    """Return the board hash of an undivided block of colour <colour>.
+    """
+    if colour in _COLOUR_KEYS:
+        return _COLOUR_KEYS[colour]
+    return _mix(hash(colour))
+
+
+def combine_hashes(child_hashes: List[int]) -> int:
+    """Return the board hash of a block whose children, in order, have the
+    board hashes <child_hashes>.
+    """
+    result = 0
+    for key, child_hash in zip(_CHILD_KEYS, child_hashes):
+        result ^= _mix(child_hash ^ key)
+    return result
+
+
+def random_init(level: int, max_depth: int,
+                rng: Optional[random.Random] = None) -> 'Block':
     """Devuelve un Bloque generado aleatoriamente con nivel <level> y subdividido
     hasta una profundidad máxima de <max_depth>.
 
@@ -319,25 +881,31 @@ def random_init(level: int, max_depth: int) -> 'Block':
     excepto la posición y el tamaño. Estos pueden ser establecidos por el cliente
     utilizando el método update_block_locations.
 
+    Los números aleatorios salen de <rng>, o del módulo random si es None.
+
     Precondición:
         level <= max_depth
     """
+    if rng is None:
+        rng = random
+
     # Caso base
     if level == max_depth:
-        b = Block(level, random.choice(COLOUR_LIST))
+        b = Block(level, rng.choice(COLOUR_LIST))
         b.max_depth = max_depth
         return b
 
     # Decide si crear un bloque padre o un bloque hoja
     # Crea bloques hijos solo si no hemos alcanzado la profundidad máxima de 1
-    if level < max_depth and random.random() < 0.7:
+    if level < max_depth and rng.random() < 0.7:
         # Crear un bloque padre con 4 hijos
-        children = [random_init(level + 1, max_depth) for _ in range(4)]
+        children = [random_init(level + 1, max_depth, rng) for _ in range(4)]
         b = Block(level, children=children)
         for child in b.children:
             child.parent = b
+            child.max_depth = max_depth
     else:
-        b = Block(level, random.choice(COLOUR_LIST))
+        b = Block(level, rng.choice(COLOUR_LIST))
 
     b.max_depth = max_depth
     return b
@@ -15,10 +15,13 @@ At the bottom of the file, there are some function that you
 can call to try playing the game in several different configurations.
 """
 import random
-from typing import List
+from typing import List, Optional, Tuple, Union
 from app.block import Block, random_init
-from app.goal import BlobGoal, PerimeterGoal
-from app.player import Player, HumanPlayer, RandomPlayer, SmartPlayer
+from app.goal import BlobGoal, PerimeterGoal, ScoreCache, score_goals
+from app.move import MoveJournal
+from app.player import (Player, HumanPlayer, RandomPlayer, SmartPlayer,
+                        SearchPlayer, MCTSPlayer)
+from app.headless import NullRenderer
 from app.renderer import Renderer, COLOUR_LIST, colour_name, BOARD_WIDTH
 
 
@@ -33,43 +36,99 @@ class Game:
         and tracking user interactions with the Blocky board.
     players:
         The entities that are playing this game.
+    journal:
+        The record of every move made on the board.  All players apply
+        their moves through it, so they can be undone and redone.
+    score_cache:
+        The scores computed during this game, shared by all players.  Its
+        hit, miss and eviction counters can be read after the game.
+    seed:
+        The master seed of this game.  The board, the goals and every
+        player draw from separate random streams derived from it, so a game
+        only depends on its seed and its players.
+    turn_scores:
+        For each move of the last run of the game, the id of the player who
+        moved and that player's score just after the move.
+    final_scores:
+        The score of each player at the end of the last run of the game.
 
     === Representation Invariants ===
     - len(players) >= 1
     """
     board: Block
-    renderer: Renderer
+    renderer: Union[Renderer, NullRenderer]
     players: List[Player]
+    journal: MoveJournal
+    score_cache: ScoreCache
+    seed: int
+    turn_scores: List[Tuple[int, int]]
+    final_scores: List[int]
 
     def __init__(self, max_depth: int,
                  num_human: int,
                  random_players: int,
-                 smart_players: List[int]) -> None:
+                 smart_players: List[int],
+                 search_players: Optional[List[int]] = None,
+                 renderer: Optional[Union[Renderer, NullRenderer]] = None,
+                 mcts_players: Optional[List[float]] = None,
+                 seed: Optional[int] = None,
+                 smart_workers: int = 0) -> None:
         """Inicialice este juego, como se describe en la tarea 2.
 
+            <search_players> da, para cada SearchPlayer, cuántas jugadas
+            mira hacia adelante como máximo, dentro de su límite de tiempo,
+            y <mcts_players> da, para cada MCTSPlayer, cuántos segundos
+            piensa cada jugada.  Estos jugadores van
+            después de todos los demás, en ese orden.
+
+            <smart_workers> es el número de procesos con que cada
+            SmartPlayer puntúa sus candidatos, o 0 para puntuarlos en este
+            proceso.  run_game cierra esos procesos al terminar.
+
+            <renderer> dibuja el juego; si es None se crea un Renderer de
+            pygame.  Con un renderer no interactivo, como NullRenderer, el
+            juego corre sin ventana y sin pausas.
+
+            Todo lo aleatorio del juego (el tablero, los objetivos y cada
+            jugador) sale de su propio random.Random, derivado de <seed>.
+            Si <seed> es None, se toma del módulo random.
+
             Condición previa:
             2 <= profundidad máxima <= 5
         """
 
         self.players = []
 
+        # Derivar una semilla independiente para cada parte del juego
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        goal_rng = _stream(seed, 'goals')
+
         # Calcular el número total de jugadores
-        total_players = num_human + random_players + len(smart_players)
+        if search_players is None:
+            search_players = []
+        if mcts_players is None:
+            mcts_players = []
+        total_players = num_human + random_players + len(smart_players) + \
+            len(search_players) + len(mcts_players)
 
         # Crear el renderer primero ya que los jugadores lo necesitan
-        self.renderer = Renderer(total_players)
+        if renderer is None:
+            renderer = Renderer(total_players)
+        self.renderer = renderer
 
         # Inicializar el tablero aleatorio y establecer posiciones/tamaños
-        self.board = random_init(0, max_depth)
+        self.board = random_init(0, max_depth, _stream(seed, 'board'))
         self.board.update_block_locations((0, 0), BOARD_WIDTH)
 
         # Crear los jugadores humanos
         for i in range(num_human):
             # Elegir un color objetivo aleatorio para este jugador
-            target_colour = random.choice(COLOUR_LIST)
+            target_colour = goal_rng.choice(COLOUR_LIST)
 
             # Crear un objetivo aleatorio (Blob o Perimeter)
-            if random.random() < 0.5:
+            if goal_rng.random() < 0.5:
                 goal = BlobGoal(target_colour)
             else:
                 goal = PerimeterGoal(target_colour)
@@ -81,10 +140,10 @@ class Game:
         # Crear los jugadores aleatorios
         for i in range(random_players):
             # Elegir un color objetivo aleatorio para este jugador
-            target_colour = random.choice(COLOUR_LIST)
+            target_colour = goal_rng.choice(COLOUR_LIST)
 
             # Crear un objetivo aleatorio (Blob o Perimeter)
-            if random.random() < 0.5:
+            if goal_rng.random() < 0.5:
                 goal = BlobGoal(target_colour)
             else:
                 goal = PerimeterGoal(target_colour)
@@ -96,25 +155,63 @@ class Game:
         # Crear los jugadores inteligentes
         for idx, difficulty in enumerate(smart_players):
             # Elegir un color objetivo aleatorio para este jugador
-            target_colour = random.choice(COLOUR_LIST)
+            target_colour = goal_rng.choice(COLOUR_LIST)
 
             # Crear un objetivo aleatorio (Blob o Perimeter)
-            if random.random() < 0.5:
+            if goal_rng.random() < 0.5:
                 goal = BlobGoal(target_colour)
             else:
                 goal = PerimeterGoal(target_colour)
 
             # Crear y añadir el jugador inteligente con su nivel de dificultad
             player_id = num_human + random_players + idx
-            player = SmartPlayer(self.renderer, player_id, goal, difficulty)
+            player = SmartPlayer(self.renderer, player_id, goal, difficulty,
+                                 workers=smart_workers)
+            self.players.append(player)
+
+        # Crear los jugadores que buscan varias jugadas hacia adelante
+        for idx, plies in enumerate(search_players):
+            target_colour = goal_rng.choice(COLOUR_LIST)
+            if goal_rng.random() < 0.5:
+                goal = BlobGoal(target_colour)
+            else:
+                goal = PerimeterGoal(target_colour)
+            player_id = num_human + random_players + len(smart_players) + idx
+            player = SearchPlayer(self.renderer, player_id, goal, plies)
+            self.players.append(player)
+
+        # Crear los jugadores que usan búsqueda de Monte Carlo
+        for time_limit in mcts_players:
+            target_colour = goal_rng.choice(COLOUR_LIST)
+            if goal_rng.random() < 0.5:
+                goal = BlobGoal(target_colour)
+            else:
+                goal = PerimeterGoal(target_colour)
+            player = MCTSPlayer(self.renderer, len(self.players), goal,
+                                time_limit)
             self.players.append(player)
 
+        # Los jugadores que buscan necesitan conocer los objetivos de todos
+        for player in self.players:
+            if isinstance(player, (SearchPlayer, MCTSPlayer)):
+                player.goals = [other.goal for other in self.players]
+
+        # Todos los jugadores registran sus movimientos en el mismo diario
+        # y comparten las puntuaciones ya calculadas
+        self.journal = MoveJournal()
+        self.score_cache = ScoreCache()
+        self.turn_scores = []
+        self.final_scores = []
+        for player in self.players:
+            player.journal = self.journal
+            player.score_cache = self.score_cache
+            player.rng = _stream(seed, f'player {player.id}')
+
         # Dibujar el tablero inicial
         if self.players:  # Verificar que haya al menos un jugador
             self.renderer.draw(self.board, 0)
 
-
-    def run_game(self, num_turns: int) -> None:
+    def run_game(self, num_turns: int, verbose: bool = True) -> int:
         """Run the game for the number of turns specified.
 
         Each player gets <num_turns> turns. The first player in self.players
@@ -127,34 +224,67 @@ class Game:
 
         When the game is over, print who won to the console.
 
+        Nothing is printed if <verbose> is False.  The score after every
+        move and the final scores are recorded in turn_scores and
+        final_scores, and the index in self.players of the winner is
+        returned.  The process pools of the players are shut down when the
+        game ends, even if it ends with an exception.
+        """
+        try:
+            return self._play_turns(num_turns, verbose)
+        finally:
+            for player in self.players:
+                if isinstance(player, SmartPlayer):
+                    player.close()
+
+    def _play_turns(self, num_turns: int, verbose: bool) -> int:
+        """Play the game as described in run_game, without shutting down
+        the process pools of the players, and return the index of the
+        winner.
         """
+        self.turn_scores = []
         # Index within self.players of the current player.
         index = 0
         for turn in range(num_turns * len(self.players)):
             player = self.players[index]
-            print(f'Player {player.id +1}, turn {turn + 1}')
+            if verbose:
+                print(f'Player {player.id +1}, turn {turn + 1}')
             if self.players[index].make_move(self.board) == 1:
                 break
             else:
-                print(f'Player {player.id + 1} CURRENT SCORE: ' +
-                      f'{player.goal.score(self.board)}')
+                score = self.score_cache.score(player.goal, self.board)
+                self.turn_scores.append((player.id, score))
+                if verbose:
+                    print(f'Player {player.id + 1} CURRENT SCORE: ' +
+                          f'{score}')
                 index = (index + 1) % len(self.players)
 
         # Determine and report the winner.
         max_score = 0
         winning_player = 0
-        for i in range(len(self.players)):
-            score = self.players[i].goal.score(self.board)
-            print(f'Player {i + 1} : {score}')
+        self.final_scores = score_goals(
+            self.board, [player.goal for player in self.players])
+        for i, score in enumerate(self.final_scores):
+            if verbose:
+                print(f'Player {i + 1} : {score}')
             if score > max_score:
                 max_score = score
                 winning_player = i
-        print(f'WINNER is Player {winning_player + 1}!')
-        print('Players had these goals:')
-        for player in self.players:
-            print(f'Player {player.id + 1} ' +
-                  f'goal = \n\t{player.goal.description()}: ' +
-                  f'{colour_name(player.goal.colour)}')
+        if verbose:
+            print(f'WINNER is Player {winning_player + 1}!')
+            print('Players had these goals:')
+            for player in self.players:
+                print(f'Player {player.id + 1} ' +
+                      f'goal = \n\t{player.goal.description()}: ' +
+                      f'{colour_name(player.goal.colour)}')
+        return winning_player
+
+
+def _stream(seed: int, name: str) -> random.Random:
+    """Return the random number generator named <name> of the game with
+    master seed <seed>.  Different names give independent streams.
+    """
+    return random.Random(f'{seed}/{name}')
 
 
 def auto_game() -> None:
@@ -11,8 +11,16 @@ University of Toronto
 This file contains the Goal class hierarchy.
 """
 
-from typing import List, Tuple
-from app.block import Block
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.block import Block, BlobSummary, COLOUR_INDEX, combine_hashes
+from app.move import Move, Path, block_at
+from app.persistent import PersistentBlock
+
+# The offset, in halves of its parent, of each child of a Block within its
+# parent, in the Block.children order.
+_CHILD_OFFSETS = ((1, 0), (0, 0), (0, 1), (1, 1))
 
 
 class Goal:
@@ -35,15 +43,87 @@ class Goal:
     def score(self, board: Block) -> int:
         """Return the current score for this goal on the given board.
 
-        The score is always greater than or equal to 0.
+        The score is always greater than or equal to 0.  It is computed with
+        score_array, unless <board> uses a colour outside COLOUR_LIST.
+        """
+        try:
+            grid = board.flatten_array()
+        except ValueError:
+            return self._score_flattened(board.flatten())
+        return self.score_array(grid)
+
+    def score_array(self, grid: np.ndarray) -> int:
+        """Return the current score for this goal on the board flattened
+        into <grid>, in the format returned by Block.flatten_array.
+
+        The result is the same as that of score on the original board.
+        """
+        raise NotImplementedError
+
+    def _score_labelled(self, grid: np.ndarray,
+                        components: Tuple[np.ndarray, np.ndarray]) -> int:
+        """Return the same as score_array(<grid>), where <components> is the
+        result of _components(<grid>), for goals that can make use of it.
+        """
+        return self.score_array(grid)
+
+    def score_after(self, board: Block, move: Move) -> int:
+        """Return the score for this goal on <board> once <move> has been
+        applied to it, leaving <board> unchanged.
+
+        A move that only reorders the children of a block is scored by
+        recomputing what the reordering can affect, so the cost depends on
+        the moved block and not on the whole board.  Other moves, such as
+        smashes, are applied, scored and undone.  An illegal move scores the
+        same as <board>.
+        """
+        order = move.permutation()
+        if order is None:
+            if not move.apply(board):
+                return self.score(board)
+            try:
+                return self.score(board)
+            finally:
+                move.undo(board)
+        if not block_at(board, move.path).children:
+            return self.score(board)
+        return self._score_reordered(board, move.path, order)
+
+    def _score_reordered(self, board: Block, path: Path,
+                         order: Tuple[int, int, int, int]) -> int:
+        """Return the score for this goal on <board> once the children of
+        the subdivided block at <path> are put in <order>, as indices into
+        the current list of children, without changing <board>.
         """
         raise NotImplementedError
 
+    def _score_flattened(self,
+                         flattened: List[List[Tuple[int, int, int]]]) -> int:
+        """Return the current score for this goal on the board flattened
+        into <flattened>, in the format returned by Block.flatten.
+        """
+        raise NotImplementedError
+
+    def block_estimate(self, block: Block, on_border: bool) -> int:
+        """Return a cheap estimate of how much rotating or swapping <block>
+        can do for this goal, higher meaning more promising, where
+        <on_border> is whether <block> touches the border of its board.
+
+        The estimate is the score of this goal on <block> alone.
+        """
+        return self.score(block)
+
     def description(self) -> str:
         """Return a description of this goal.
         """
         raise NotImplementedError
 
+    def _colour_index(self) -> Optional[int]:
+        """Return the index of this goal's target colour in COLOUR_LIST, or
+        None if it is not there.
+        """
+        return COLOUR_INDEX.get(self.colour)
+
 
 class BlobGoal(Goal):
     """A goal to create the largest connected blob of this goal's target
@@ -69,9 +149,13 @@ class BlobGoal(Goal):
 
         Update <visited> so that all cells that are visited are marked with
         either 0 or 1.
+
+        The search uses an explicit stack, so it works for blobs of any
+        size.
         """
         row, col = pos
-        if row < 0 or row >= len(board) or col < 0 or col >= len(board[0]):
+        n = len(board)
+        if row < 0 or row >= n or col < 0 or col >= len(board[0]):
             return 0
 
         if visited[row][col] != -1:
@@ -82,40 +166,86 @@ class BlobGoal(Goal):
             return 0
 
         visited[row][col] = 1
-
-        blob_size = 1
-
-        # Up
-        blob_size += self._undiscovered_blob_size((row - 1, col), board, visited)
-        # Down
-        blob_size += self._undiscovered_blob_size((row + 1, col), board, visited)
-        # Left
-        blob_size += self._undiscovered_blob_size((row, col - 1), board, visited)
-        # Right
-        blob_size += self._undiscovered_blob_size((row, col + 1), board, visited)
+        blob_size = 0
+        stack = [pos]
+        while stack:
+            row, col = stack.pop()
+            blob_size += 1
+            # Arriba, abajo, izquierda y derecha
+            for r, c in ((row - 1, col), (row + 1, col),
+                         (row, col - 1), (row, col + 1)):
+                if 0 <= r < n and 0 <= c < len(board[r]) \
+                        and visited[r][c] == -1:
+                    if board[r][c] == self.colour:
+                        visited[r][c] = 1
+                        stack.append((r, c))
+                    else:
+                        visited[r][c] = 0
 
         return blob_size
 
     def score(self, board: Block) -> int:
-        """Devuelve la puntuación actual de este gol en el tablero dado.
+        """Return the current score for this goal on the given board.
 
-           La puntuación es el tamaño de la mancha conectada más grande del color objetivo del gol.
+        The score is the size of the largest blob of the target colour.  It
+        is computed from the memoized blob summaries of the blocks, without
+        expanding the board into unit cells.  Boards that keep no blob
+        summaries, such as a LinearBoard, are scored as in Goal.score.
         """
+        if not isinstance(board, (Block, PersistentBlock)):
+            return super().score(board)
+        return board.blob_summary(self.colour).largest()
+
+    def _score_reordered(self, board: Block, path: Path,
+                         order: Tuple[int, int, int, int]) -> int:
+        """Return the score for this goal on <board> once the children of
+        the block at <path> are put in <order>.
+
+        The blob summary of the moved block is merged again from its
+        reordered children, then those of its ancestors from their cached
+        children's summaries.
+        """
+        blocks = [board]
+        for index in path:
+            blocks.append(blocks[-1].children[index])
+        children = blocks[-1].children
+        summary = BlobSummary.merge(
+            [children[i].blob_summary(self.colour) for i in order])
+        for parent, index in zip(reversed(blocks[:-1]), reversed(path)):
+            summaries = [child.blob_summary(self.colour)
+                         for child in parent.children]
+            summaries[index] = summary
+            summary = BlobSummary.merge(summaries)
+        return summary.largest()
+
+    def _score_flattened(self,
+                         flattened: List[List[Tuple[int, int, int]]]) -> int:
+        """Devuelve la puntuación actual de este gol en el tablero aplanado.
 
-        flattened = board.flatten()
-        n = len(flattened)
-
-        visited = [[-1 for _ in range(n)] for _ in range(n)]
-
-        max_blob_size = 0
+           La puntuación es el tamaño de la mancha conectada más grande del color objetivo del gol.
+           Se recorre el tablero aplanado sin recursión, así que sirve para cualquier profundidad.
+        """
+        colour = self.colour
+        cells = [cell == colour for column in flattened for cell in column]
+        return _largest_blob(cells, len(flattened))
 
-        for i in range(n):
-            for j in range(n):
-                if visited[i][j] == -1:
-                    blob_size = self._undiscovered_blob_size((i, j), flattened, visited)
-                    max_blob_size = max(max_blob_size, blob_size)
+    def score_array(self, grid: np.ndarray) -> int:
+        """Return the current score for this goal on the board flattened
+        into <grid>, in the format returned by Block.flatten_array.
+        """
+        return self._score_labelled(grid, _components(grid))
 
-        return max_blob_size
+    def _score_labelled(self, grid: np.ndarray,
+                        components: Tuple[np.ndarray, np.ndarray]) -> int:
+        """Return the same as score_array(<grid>), where <components> is the
+        result of _components(<grid>).
+        """
+        target = self._colour_index()
+        if target is None:
+            return 0
+        colours, sizes = components
+        sizes = sizes[colours == target]
+        return int(sizes.max()) if len(sizes) else 0
 
     def description(self) -> str:
         """Return a description of this goal.
@@ -125,8 +255,104 @@ class BlobGoal(Goal):
 
 class PerimeterGoal(Goal):
 
+    # === Private Attributes ===
+    # _memo:
+    #     The board hash, width in cells and score of the last board
+    #     scored, or None.
+    _memo: Optional[Tuple[int, int, int]]
+
+    def __init__(self, target_colour: Tuple[int, int, int]) -> None:
+        """Initialize this goal to have the given target colour.
+        """
+        super().__init__(target_colour)
+        self._memo = None
+
     def score(self, board: Block) -> int:
-        flattened = board.flatten()
+        """Return the current score for this goal on the given board.
+
+        Only the blocks touching the border of the board are visited, and
+        each undivided one adds the number of its unit cells lying on each
+        border, so corner cells count twice.  The score of the last board
+        is remembered by its board hash.  Boards that are not trees of
+        blocks, such as a LinearBoard, are scored as in Goal.score.
+        """
+        if not isinstance(board, (Block, PersistentBlock)):
+            return super().score(board)
+        n = 2 ** (board.max_depth - board.level)
+        if self._memo is not None and \
+                self._memo[:2] == (board.board_hash(), n):
+            return self._memo[2]
+        score = self._border_cells(board, 0, 0, n, n)
+        self._memo = (board.board_hash(), n, score)
+        return score
+
+    def _score_reordered(self, board: Block, path: Path,
+                         order: Tuple[int, int, int, int]) -> int:
+        """Return the score for this goal on <board> once the children of
+        the block at <path> are put in <order>.
+
+        Only the border cells of the moved block can change, so they are
+        counted before and after the reordering.
+        """
+        n = 2 ** (board.max_depth - board.level)
+        block, x, y, size = board, 0, 0, n
+        for index in path:
+            size //= 2
+            dx, dy = _CHILD_OFFSETS[index]
+            block = block.children[index]
+            x, y = x + dx * size, y + dy * size
+        score = self.score(board)
+        if 0 < x and 0 < y and x + size < n and y + size < n:
+            return score
+
+        half = size // 2
+        for i, (dx, dy) in enumerate(_CHILD_OFFSETS):
+            child_x, child_y = x + dx * half, y + dy * half
+            score -= self._border_cells(block.children[i],
+                                        child_x, child_y, half, n)
+            score += self._border_cells(block.children[order[i]],
+                                        child_x, child_y, half, n)
+        return score
+
+    def block_estimate(self, block: Block, on_border: bool) -> int:
+        """Return a cheap estimate of how much rotating or swapping <block>
+        can do for this goal, higher meaning more promising, where
+        <on_border> is whether <block> touches the border of its board.
+
+        Moves on a block away from the border cannot change the score, so
+        they are estimated at 0.  Other blocks are estimated by the score of
+        this goal on the block alone, which leaves the memo of score alone.
+        """
+        if not on_border:
+            return 0
+        n = 2 ** (block.max_depth - block.level)
+        return self._border_cells(block, 0, 0, n, n)
+
+    def _border_cells(self, block: Block, x: int, y: int, size: int,
+                      n: int) -> int:
+        """Return the score that the cells of <block> would earn if it were
+        placed with its upper-left cell in column <x> and row <y> of an <n>
+        by <n> board, where <size> is its width in cells.
+        """
+        score = 0
+        stack = [(block, x, y, size)]
+        while stack:
+            block, x, y, size = stack.pop()
+            if not block.children:
+                if block.colour == self.colour:
+                    score += size * ((x == 0) + (y == 0) +
+                                     (x + size == n) + (y + size == n))
+                continue
+            half = size // 2
+            for child, (dx, dy) in zip(block.children, _CHILD_OFFSETS):
+                child_x, child_y = x + dx * half, y + dy * half
+                if child_x == 0 or child_y == 0 or \
+                        child_x + half == n or child_y + half == n:
+                    stack.append((child, child_x, child_y, half))
+        return score
+
+    def _score_flattened(self,
+                         flattened: List[List[Tuple[int, int, int]]]) -> int:
         n = len(flattened)
         score = 0
 
@@ -146,10 +372,275 @@ class PerimeterGoal(Goal):
 
         return score
 
+    def score_array(self, grid: np.ndarray) -> int:
+        """Return the current score for this goal on the board flattened
+        into <grid>, in the format returned by Block.flatten_array.
+        """
+        target = self._colour_index()
+        if target is None:
+            return 0
+        mask = grid == target
+        # Each border is counted once, so the corners are counted twice.
+        return int(mask[0].sum() + mask[-1].sum() +
+                   mask[:, 0].sum() + mask[:, -1].sum())
+
     def description(self) -> str:
         return f"Poner la mayor cantidad de celdas {self.colour} en el borde del tablero. Las esquinas valen puntos dobles."
 
 
+class ScoreCache:
+    """A bounded memo of goal scores, shared by the players of a Game.
+
+    Scores are keyed by the type and target colour of the goal and by the
+    board hash and depth of the board, so any board that recurs, however it
+    was reached, is only scored once while it stays in the cache.  When the
+    cache is full, the least recently used score is evicted.
+
+    === Public Attributes ===
+    capacity:
+        The maximum number of scores kept.
+    hits:
+        The number of scores found in the cache.
+    misses:
+        The number of scores that had to be computed.
+    evictions:
+        The number of scores evicted to make room for others.
+
+    === Representation Invariants ===
+    - capacity >= 1
+    - len(self) <= capacity
+    """
+    # === Private Attributes ===
+    # _scores:
+    #     The cached scores, least recently used first.
+    capacity: int
+    hits: int
+    misses: int
+    evictions: int
+    _scores: 'OrderedDict[tuple, int]'
+
+    def __init__(self, capacity: int = 4096) -> None:
+        """Initialize this cache to hold up to <capacity> scores.
+
+        Raise a ValueError if <capacity> is less than 1.
+        """
+        if capacity < 1:
+            raise ValueError('a score cache holds at least one score')
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scores = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of scores in this cache.
+        """
+        return len(self._scores)
+
+    def score(self, goal: Goal, board: Block) -> int:
+        """Return goal.score(<board>), from this cache if possible.
+        """
+        key = _cache_key(goal, board, board.board_hash())
+        score = self._lookup(key)
+        if score is None:
+            score = goal.score(board)
+            self._store(key, score)
+        return score
+
+    def score_after(self, goal: Goal, board: Block, move: Move) -> int:
+        """Return goal.score_after(<board>, <move>), from this cache if
+        possible.
+
+        The board hash after a move that reorders children is known without
+        applying the move, so such scores are cached under it.  Other moves
+        are scored by the goal directly.
+        """
+        order = move.permutation()
+        if order is None:
+            return goal.score_after(board, move)
+        key = _cache_key(goal, board, _hash_after(board, move.path, order))
+        score = self._lookup(key)
+        if score is None:
+            score = goal.score_after(board, move)
+            self._store(key, score)
+        return score
+
+    def cached_after(self, goal: Goal, board: Block,
+                     move: Move) -> Optional[int]:
+        """Return the score that score_after(<goal>, <board>, <move>) would
+        find in this cache, or None if it would have to be computed.
+
+        Neither the counters nor the order of eviction change.
+        """
+        order = move.permutation()
+        if order is None:
+            return None
+        return self._scores.get(
+            _cache_key(goal, board, _hash_after(board, move.path, order)))
+
+    def clear(self) -> None:
+        """Discard every score in this cache, keeping the counters.
+        """
+        self._scores.clear()
+
+    def _lookup(self, key: tuple) -> Optional[int]:
+        """Return the score cached under <key>, marking it as the most
+        recently used, or None if there is none.
+        """
+        score = self._scores.get(key)
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._scores.move_to_end(key)
+        return score
+
+    def _store(self, key: tuple, score: int) -> None:
+        """Cache <score> under <key>, evicting the least recently used score
+        if this cache is full.
+        """
+        self._scores[key] = score
+        if len(self._scores) > self.capacity:
+            self._scores.popitem(last=False)
+            self.evictions += 1
+
+
+def _cache_key(goal: Goal, board: Block, board_hash: int) -> tuple:
+    """Return the ScoreCache key for <goal> on a board like <board> with the
+    board hash <board_hash>.
+    """
+    return (type(goal), goal.colour, board.max_depth - board.level,
+            board_hash)
+
+
+def _hash_after(board: Block, path: Path,
+                order: Tuple[int, int, int, int]) -> int:
+    """Return the board hash that <board> would have once the children of
+    the block at <path> are put in <order>, without changing <board>.
+    """
+    blocks = [board]
+    for index in path:
+        blocks.append(blocks[-1].children[index])
+    if not blocks[-1].children:
+        return board.board_hash()
+    children = blocks[-1].children
+    board_hash = combine_hashes([children[i].board_hash() for i in order])
+    for parent, index in zip(reversed(blocks[:-1]), reversed(path)):
+        hashes = [child.board_hash() for child in parent.children]
+        hashes[index] = board_hash
+        board_hash = combine_hashes(hashes)
+    return board_hash
+
+
+def score_goals(board: Block, goals: Sequence[Goal]) -> List[int]:
+    """Return the score of each of <goals> on <board>, in order.
+
+    The board is flattened once, and the connected regions of every colour
+    are labelled in a single pass shared by all of the goals.
+    """
+    try:
+        grid = board.flatten_array()
+    except ValueError:
+        return [goal.score(board) for goal in goals]
+    components = None
+    scores = []
+    for goal in goals:
+        if components is None and isinstance(goal, BlobGoal):
+            components = _components(grid)
+        scores.append(goal._score_labelled(grid, components))
+    return scores
+
+
+def _largest_blob(cells: Sequence[bool], n: int) -> int:
+    """Return the size of the largest connected group of True cells in the
+    <n> by <n> grid stored row after row in <cells>.
+
+    Cells are connected if their sides touch.  The search uses an explicit
+    stack, so it works for boards of any size.
+    """
+    visited = bytearray(n * n)
+    largest = 0
+    for start, is_target in enumerate(cells):
+        if not is_target or visited[start]:
+            continue
+        visited[start] = 1
+        stack = [start]
+        size = 0
+        while stack:
+            cell = stack.pop()
+            size += 1
+            row, col = divmod(cell, n)
+            for neighbour, inside in ((cell - n, row > 0),
+                                      (cell + n, row < n - 1),
+                                      (cell - 1, col > 0),
+                                      (cell + 1, col < n - 1)):
+                if inside and cells[neighbour] and not visited[neighbour]:
+                    visited[neighbour] = 1
+                    stack.append(neighbour)
+        largest = max(largest, size)
+    return largest
+
+
+
+def _components(grid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the colour index and the size of every connected region of
+    equal cells in <grid>, as two parallel arrays.
+
+    Cells are connected if their sides touch.  Each row of <grid> is cut into
+    runs of equal cells, and runs of the same colour that touch across
+    adjacent rows are merged by _merge_runs, so the work per pass is a few
+    NumPy operations over the runs.
+    """
+    rows, cols = grid.shape
+    starts = np.ones(grid.shape, dtype=bool)
+    starts[:, 1:] = grid[:, 1:] != grid[:, :-1]
+    run_of_cell = np.cumsum(starts.ravel()) - 1
+    run_colour = grid.ravel()[starts.ravel()]
+    run_length = np.bincount(run_of_cell)
+
+    # Every vertically adjacent pair of equal cells joins the two runs
+    # holding them.
+    same = (grid[1:] == grid[:-1]).ravel()
+    upper = run_of_cell[:-cols][same]
+    lower = run_of_cell[cols:][same]
+
+    labels, _ = _merge_runs(len(run_colour), upper, lower)
+    roots, component = np.unique(labels, return_inverse=True)
+    sizes = np.bincount(component, weights=run_length).astype(np.int64)
+    return run_colour[roots], sizes
+
+
+def _merge_runs(count: int, upper: np.ndarray,
+                lower: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Return the label of each of <count> runs, the lowest run connected to
+    it through the pairs of runs <upper>[i], <lower>[i], together with the
+    number of rounds taken.
+
+    In each round, the root of every component is hooked onto the lowest
+    root that it is joined to, and then pointers are jumped until every run
+    points straight at its root.  Hooking roots rather than runs merges
+    whole components at once, so the number of rounds does not grow with
+    the length of the paths inside a blob.
+    """
+    labels = np.arange(count)
+    rounds = 0
+    while True:
+        rounds += 1
+        upper_root = labels[upper]
+        lower_root = labels[lower]
+        lowest = np.minimum(upper_root, lower_root)
+        new = labels.copy()
+        np.minimum.at(new, upper_root, lowest)
+        np.minimum.at(new, lower_root, lowest)
+        while True:
+            jumped = new[new]
+            if np.array_equal(jumped, new):
+                break
+            new = jumped
+        if np.array_equal(new, labels):
+            return labels, rounds
+        labels = new
+
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
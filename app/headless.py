@@ -0,0 +1,65 @@
+"""Assignment 2 - Blocky
+
+=== Module Description ===
+
+This file contains renderers for running games without a display.
+
+They have the same interface as Renderer but never touch pygame, and they
+are not interactive, so computer players neither highlight their moves nor
+wait for people to see them.  A Game given one of these renderers runs as
+fast as its players can choose moves.
+"""
+from typing import List, Tuple
+
+
+class NullRenderer:
+    """A renderer that draws nothing.
+
+    === Attributes ===
+    interactive:
+        False, since nobody watches the game.
+    """
+    interactive = False
+
+    def __init__(self, num_players: int = 0) -> None:
+        """Initialize this renderer for a game with <num_players> players.
+        """
+
+    def draw(self, board: 'Block', player_id: int) -> None:
+        """Do nothing instead of drawing <board>.
+        """
+
+    def display_goal(self, player: 'Player') -> None:
+        """Do nothing instead of displaying the goal of <player>.
+        """
+
+
+class RecordingRenderer(NullRenderer):
+    """A renderer that records what it was asked to draw.
+
+    === Attributes ===
+    frames:
+        For every call to draw, in order, the id of the player whose turn it
+        was and the board hash of the board drawn.
+    goals_shown:
+        The ids of the players whose goals were displayed, in order.
+    """
+    frames: List[Tuple[int, int]]
+    goals_shown: List[int]
+
+    def __init__(self, num_players: int = 0) -> None:
+        """Initialize this renderer, with nothing recorded yet.
+        """
+        super().__init__(num_players)
+        self.frames = []
+        self.goals_shown = []
+
+    def draw(self, board: 'Block', player_id: int) -> None:
+        """Record that <board> was drawn on the turn of <player_id>.
+        """
+        self.frames.append((player_id, board.board_hash()))
+
+    def display_goal(self, player: 'Player') -> None:
+        """Record that the goal of <player> was displayed.
+        """
+        self.goals_shown.append(player.id)
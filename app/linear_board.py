@@ -0,0 +1,371 @@
+"""Assignment 2 - Blocky
+
+=== Module Description ===
+
+This file contains the LinearBoard class, a compact alternative to a tree of
+Block objects.
+
+A LinearBoard stores the whole quadtree in flat arrays indexed by Morton
+(Z-order) codes instead of one Python object per block.  Every block is
+addressed by a node, that is a (level, code) pair, where <code> is the
+Morton code of the block among the 4 ** level blocks of that level.  The
+quadrant digit of a child within its parent is
+
+    0: upper-left, 1: upper-right, 2: lower-left, 3: lower-right
+
+so the cells covered by any block are a contiguous range of the array one
+level further down, and rotating or swapping a block is a permutation of
+four contiguous slices per level below it.
+"""
+import random
+from typing import List, Optional, Tuple
+import numpy as np
+from app.block import (Block, COLOUR_INDEX, FRAME_COLOUR, HIGHLIGHT_COLOUR,
+                       ROTATIONS, SWAPS)
+from app.palette import COLOUR_LIST
+
+# The Morton quadrant digit of each child of a Block, indexed by the
+# position of that child in Block.children (upper-right, upper-left,
+# lower-left, lower-right).  This permutation is its own inverse.
+_QUADRANT = (1, 0, 2, 3)
+
+Node = Tuple[int, int]
+
+
+class LinearBoard:
+    """A Blocky board stored as a linear quadtree.
+
+    === Public Attributes ===
+    max_depth:
+        The deepest level allowed in this board.
+    palette:
+        The colours that may appear on this board.  Cells store indices
+        into this list.
+    position:
+        The (x, y) coordinates of the upper left corner of the board.
+    size:
+        The height and width of the board.
+    highlighted:
+        The node that the user has selected for action, or None.
+
+    === Private Attributes ===
+    _cells:
+        The palette index of every unit cell, in Morton order.
+    _split:
+        For every level below max_depth, one flag per node of that level,
+        in Morton order, which is 1 iff that node is subdivided.
+
+    === Representation Invariants ===
+    - len(_cells) == 4 ** max_depth
+    - len(_split) == max_depth and len(_split[level]) == 4 ** level
+    - A node is only subdivided if its parent is subdivided.
+    - All the cells of an undivided node have the same palette index.
+    """
+    __slots__ = ('max_depth', 'palette', 'position', 'size', 'highlighted',
+                 '_cells', '_split')
+    max_depth: int
+    palette: List[Tuple[int, int, int]]
+    position: Tuple[int, int]
+    size: int
+    highlighted: Optional[Node]
+    _cells: bytearray
+    _split: List[bytearray]
+
+    def __init__(self, max_depth: int, colour_index: int = 0,
+                 palette: Optional[List[Tuple[int, int, int]]] = None) -> None:
+        """Initialize this board as a single undivided block of colour
+        <palette>[<colour_index>], allowing subdivision down to <max_depth>.
+
+        <palette> defaults to COLOUR_LIST.
+        """
+        self.max_depth = max_depth
+        self.palette = list(COLOUR_LIST if palette is None else palette)
+        self.position = (0, 0)
+        self.size = 0
+        self.highlighted = None
+        self._cells = bytearray([colour_index]) * (4 ** max_depth)
+        self._split = [bytearray(4 ** level) for level in range(max_depth)]
+
+    def is_leaf(self, node: Node) -> bool:
+        """Return whether <node> is an undivided block.
+        """
+        level, code = node
+        return level == self.max_depth or not self._split[level][code]
+
+    def children(self, node: Node) -> List[Node]:
+        """Return the children of <node>, in the same order as
+        Block.children, or an empty list if <node> is undivided.
+        """
+        if self.is_leaf(node):
+            return []
+        level, code = node
+        return [(level + 1, code * 4 + quadrant) for quadrant in _QUADRANT]
+
+    def colour(self, node: Node) -> Optional[Tuple[int, int, int]]:
+        """Return the colour of <node>, or None if <node> is subdivided.
+        """
+        if not self.is_leaf(node):
+            return None
+        level, code = node
+        return self.palette[self._cells[code << 2 * (self.max_depth - level)]]
+
+    def geometry(self, node: Node) -> Tuple[Tuple[int, int], int]:
+        """Return the position and size of <node>, computed the same way
+        as Block.update_block_locations does.
+        """
+        level, code = node
+        x, y = self.position
+        size = self.size
+        for shift in range(2 * (level - 1), -1, -2):
+            quadrant = (code >> shift) & 3
+            size //= 2
+            x += size * (quadrant & 1)
+            y += size * (quadrant >> 1)
+        return (x, y), size
+
+    def update_block_locations(self, top_left: Tuple[int, int],
+                               size: int) -> None:
+        """Set the position and size of this board.
+
+        The geometry of every other block is derived from these on demand.
+        """
+        self.position = top_left
+        self.size = size
+
+    def _permute(self, node: Node, order: Tuple[int, int, int, int]) -> None:
+        """Reorder the children of <node> so that its new i-th child (in
+        Block.children order) is its old <order>[i]-th child.
+        """
+        level, code = node
+        if self.is_leaf(node):
+            return
+        arrays = self._split[level + 1:] + [self._cells]
+        span = 4
+        for array in arrays:
+            quarter = span // 4
+            start = code * span
+            parts = [array[start + q * quarter:start + (q + 1) * quarter]
+                     for q in range(4)]
+            new = [b''] * 4
+            for i in range(4):
+                new[_QUADRANT[i]] = parts[_QUADRANT[order[i]]]
+            array[start:start + span] = b''.join(new)
+            span *= 4
+
+    def rotate(self, node: Node, direction: int) -> None:
+        """Rotate <node>.
+
+        If <direction> is 1, rotate clockwise.  If <direction> is 3, rotate
+        counterclockwise.  If <node> has no children, do nothing.
+        """
+        if direction in ROTATIONS:
+            self._permute(node, ROTATIONS[direction])
+
+    def swap(self, node: Node, direction: int) -> None:
+        """Swap the children of <node>.
+
+        If <direction> is 1, swap vertically.  If <direction> is 0, swap
+        horizontally.  If <node> has no children, do nothing.
+        """
+        if direction in SWAPS:
+            self._permute(node, SWAPS[direction])
+
+    def smash(self, node: Node, rng: Optional[random.Random] = None) -> bool:
+        """Smash <node>, giving it four new children randomly generated
+        with <rng>, or with the random module if it is None.
+
+        A node can be smashed iff it is not the top-level node and it is
+        not already at max_depth.
+
+        Return True iff <node> was smashed.
+        """
+        level, code = node
+        if level == 0 or level == self.max_depth:
+            return False
+        self._split[level][code] = 1
+        for quadrant in _QUADRANT:
+            self._fill_random((level + 1, code * 4 + quadrant),
+                              random if rng is None else rng)
+        return True
+
+    def _fill_random(self, node: Node, rng: random.Random) -> None:
+        """Overwrite <node> with a block randomly generated with <rng>,
+        using the same strategy as random_init.
+        """
+        level, code = node
+        if level < self.max_depth and rng.random() < 0.7:
+            self._split[level][code] = 1
+            for quadrant in _QUADRANT:
+                self._fill_random((level + 1, code * 4 + quadrant), rng)
+            return
+
+        # Clear every subdivision flag below this node, then paint its cells.
+        span = 1
+        for deeper in range(level, self.max_depth):
+            self._split[deeper][code * span:(code + 1) * span] = \
+                bytes(span)
+            span *= 4
+        colour_index = rng.randrange(len(self.palette))
+        self._cells[code * span:(code + 1) * span] = \
+            bytes([colour_index]) * span
+
+    def get_selected_block(self, location: Tuple[int, int],
+                           level: int) -> Node:
+        """Return the node that contains <location> and is at <level>.
+
+        If no node at <level> contains <location>, return the deepest node
+        that does, exactly as Block.get_selected_block does.
+        """
+        x, y = location
+        left, top = self.position
+        size = self.size
+        if not (left <= x < left + size and top <= y < top + size):
+            return 0, 0
+
+        current, code = 0, 0
+        while current < level and not self.is_leaf((current, code)):
+            child_size = size // 2
+            dx, dy = x - left, y - top
+            if dx >= 2 * child_size or dy >= 2 * child_size:
+                break
+            right = int(dx >= child_size)
+            bottom = int(dy >= child_size)
+            code = code * 4 + (bottom << 1 | right)
+            left += child_size * right
+            top += child_size * bottom
+            size = child_size
+            current += 1
+        return current, code
+
+    def flatten(self) -> List[List[Tuple[int, int, int]]]:
+        """Return a two-dimensional list representing this board as rows
+        and columns of unit cells, in the same format as Block.flatten.
+        """
+        xs, ys = _morton_tables(self.max_depth)
+        cells = self._cells
+        palette = self.palette
+        return [[palette[cells[x_bits | y_bits]] for y_bits in ys]
+                for x_bits in xs]
+
+    def flatten_array(self) -> np.ndarray:
+        """Return this board as a square array of unit cells, in the same
+        format as Block.flatten_array.
+
+        Raise a ValueError if a cell of this board has a colour that is not
+        in COLOUR_LIST.
+        """
+        lookup = np.array([COLOUR_INDEX.get(colour, -1)
+                           for colour in self.palette], dtype=np.int16)
+        xs, ys = _morton_tables(self.max_depth)
+        cells = np.frombuffer(bytes(self._cells), dtype=np.uint8)
+        grid = lookup[cells[np.add.outer(xs, ys)]]
+        if (grid < 0).any():
+            raise ValueError('board has a colour that is not in COLOUR_LIST')
+        return grid.astype(np.uint8)
+
+    def rectangles_to_draw(self) -> List[Tuple[Tuple[int, int, int],
+                                               Tuple[int, int],
+                                               Tuple[int, int],
+                                               int]]:
+        """Return a list of tuples describing all of the rectangles to be
+        drawn in order to render this board, in the format used by
+        Block.rectangles_to_draw.
+        """
+        rectangles = []
+        stack = [(0, 0)]
+        while stack:
+            node = stack.pop()
+            if self.is_leaf(node):
+                position, size = self.geometry(node)
+                rectangles.append(
+                    (self.colour(node), position, (size, size), 0))
+                rectangles.append(
+                    (FRAME_COLOUR, position, (size, size), 3))
+            else:
+                stack.extend(self.children(node))
+
+        if self.highlighted is not None:
+            position, size = self.geometry(self.highlighted)
+            rectangles.append(
+                (HIGHLIGHT_COLOUR, position, (size, size), 5))
+        return rectangles
+
+    @classmethod
+    def from_block(cls, block: Block,
+                   palette: Optional[List[Tuple[int, int, int]]] = None
+                   ) -> 'LinearBoard':
+        """Return a LinearBoard equivalent to the tree rooted at <block>.
+
+        The geometry of the board is taken from <block>.  Raise a ValueError
+        if a colour of <block> is not in <palette>, which defaults to
+        COLOUR_LIST.
+
+        Precondition: <block> is a top-level block.
+        """
+        board = cls(block.max_depth, palette=palette)
+        board.position = block.position
+        board.size = block.size
+        stack = [(block, (0, 0))]
+        while stack:
+            b, node = stack.pop()
+            level, code = node
+            if b.children:
+                board._split[level][code] = 1
+                for child, quadrant in zip(b.children, _QUADRANT):
+                    stack.append((child, (level + 1, code * 4 + quadrant)))
+            else:
+                if b.colour not in board.palette:
+                    raise ValueError(f'colour {b.colour} is not in palette')
+                span = 4 ** (board.max_depth - level)
+                board._cells[code * span:(code + 1) * span] = \
+                    bytes([board.palette.index(b.colour)]) * span
+        return board
+
+    def to_block(self) -> Block:
+        """Return a tree of Blocks equivalent to this board, with its
+        positions and sizes already set.
+        """
+        root = self._build_block((0, 0))
+        root.update_block_locations(self.position, self.size)
+        return root
+
+    def _build_block(self, node: Node) -> Block:
+        """Return a new tree of Blocks equivalent to the subtree rooted at
+        <node>, without positions or sizes.
+        """
+        level = node[0]
+        if self.is_leaf(node):
+            block = Block(level, self.colour(node))
+        else:
+            block = Block(level, children=[self._build_block(child)
+                                           for child in self.children(node)])
+            for child in block.children:
+                child.max_depth = self.max_depth
+        block.max_depth = self.max_depth
+        return block
+
+
+def _morton_tables(max_depth: int) -> Tuple[List[int], List[int]]:
+    """Return the Morton code contribution of every column and of every row
+    of a board with the given <max_depth>.
+
+    The Morton code of the cell in column x and row y is xs[x] | ys[y].
+    """
+    xs = [0] * (2 ** max_depth)
+    for x in range(2 ** max_depth):
+        code = 0
+        for bit in range(max_depth):
+            code |= ((x >> bit) & 1) << (2 * bit)
+        xs[x] = code
+    return xs, [code << 1 for code in xs]
+
+
+def random_board(max_depth: int,
+                 rng: Optional[random.Random] = None) -> LinearBoard:
+    """Return a LinearBoard randomly generated with <rng>, or with the random
+    module if it is None, subdivided up to a maximum depth of <max_depth>,
+    using the same strategy as random_init.
+    """
+    board = LinearBoard(max_depth)
+    board._fill_random((0, 0), random if rng is None else rng)
+    return board
@@ -0,0 +1,343 @@
+"""Assignment 2 - Blocky
+
+=== Module Description ===
+
+This file contains the Move class hierarchy and the MoveJournal class.
+
+A Move describes one action on a board: rotating a block clockwise or
+counterclockwise, swapping its children horizontally or vertically, or
+smashing it.  A Move refers to its block by path, that is the tuple of
+child indices (in the Block.children order) leading from the top-level
+block down to it, so the same Move can be applied to any copy of a board.
+Applying or undoing a Move costs O(depth).
+
+A MoveJournal records the moves applied to a board so that they can be
+undone, redone, or rolled back in bulk, and generate_moves lists the
+distinct moves available on a board.
+"""
+import random
+from typing import List, Optional, Tuple
+from app.block import ROTATIONS, SWAPS
+
+Path = Tuple[int, ...]
+
+# Directions, as understood by Block.rotate and Block.swap.
+CLOCKWISE = 1
+COUNTERCLOCKWISE = 3
+HORIZONTAL = 0
+VERTICAL = 1
+
+
+def block_path(block: 'Block') -> Path:
+    """Return the path from the top-level block of <block>'s tree down to
+    <block>.
+    """
+    path = []
+    while block.parent is not None:
+        path.append(block.parent.children.index(block))
+        block = block.parent
+    path.reverse()
+    return tuple(path)
+
+
+def block_at(board: 'Block', path: Path) -> 'Block':
+    """Return the block at <path> within <board>.
+    """
+    block = board
+    for index in path:
+        block = block.children[index]
+    return block
+
+
+def generate_moves(board: 'Block', smash: bool = False,
+                   rng: Optional[random.Random] = None) -> List['Move']:
+    """Return every distinct move on <board> that changes it, each once.
+
+    Rotations and swaps of a block whose children would end up in an order
+    that is already listed for that block, or unchanged, are skipped, so
+    leaves and blocks with four identical children produce no moves.  Since
+    a Block cannot be smashed into a known outcome, one Smash, drawing from
+    <rng>, is included for every block that can be smashed iff <smash> is
+    True.  Blocks are visited in pre-order and moves listed as rotations
+    before swaps.
+    """
+    moves = []
+    stack = [(board, ())]
+    while stack:
+        block, path = stack.pop()
+        if smash and 0 < block.level < block.max_depth:
+            moves.append(Smash(path, rng))
+        moves.extend(block_moves(block, path))
+        for index in range(len(block.children) - 1, -1, -1):
+            stack.append((block.children[index], path + (index,)))
+    return moves
+
+
+def block_moves(block: 'Block', path: Path) -> List['Move']:
+    """Return the distinct rotations and swaps of <block>, which is at
+    <path> within its board, that change it, as listed by generate_moves.
+    """
+    if not block.children:
+        return []
+    moves = []
+    hashes = [child.board_hash() for child in block.children]
+    seen = {tuple(hashes)}
+    for move in (Rotate(path, CLOCKWISE), Rotate(path, COUNTERCLOCKWISE),
+                 Swap(path, HORIZONTAL), Swap(path, VERTICAL)):
+        outcome = tuple(hashes[i] for i in move.permutation())
+        if outcome not in seen:
+            seen.add(outcome)
+            moves.append(move)
+    return moves
+
+
+class Move:
+    """An action on a block of a Blocky board.
+
+    This is an abstract class. Only child classes should be instantiated.
+
+    === Public Attributes ===
+    path:
+        The path from the top-level block down to the block this move acts
+        on.
+    """
+    path: Path
+
+    def __init__(self, path: Path) -> None:
+        """Initialize this move to act on the block at <path>.
+        """
+        self.path = tuple(path)
+
+    def apply(self, board: 'Block') -> bool:
+        """Apply this move to the top-level block <board>.
+
+        Return True iff the move was legal and has been applied.
+        """
+        raise NotImplementedError
+
+    def undo(self, board: 'Block') -> None:
+        """Revert this move, which was the last one applied to <board>.
+        """
+        raise NotImplementedError
+
+    def permutation(self) -> Optional[Tuple[int, int, int, int]]:
+        """Return the new order of the children of this move's block, as
+        indices into the old list of children, or None if this move does not
+        just reorder them.
+        """
+        return None
+
+    def _key(self) -> tuple:
+        """Return a tuple identifying this move, used for equality.
+        """
+        return type(self).__name__, self.path
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Move) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}{self._key()[1:]}'
+
+
+class Rotate(Move):
+    """A rotation of a block, clockwise or counterclockwise.
+
+    === Public Attributes ===
+    direction:
+        CLOCKWISE or COUNTERCLOCKWISE, as understood by Block.rotate.
+    """
+    direction: int
+
+    def __init__(self, path: Path, direction: int) -> None:
+        """Initialize this move to rotate the block at <path> in
+        <direction>.
+        """
+        super().__init__(path)
+        self.direction = direction
+
+    def apply(self, board: 'Block') -> bool:
+        """Rotate the block of this move.  This is always legal.
+        """
+        block_at(board, self.path).rotate(self.direction)
+        return True
+
+    def undo(self, board: 'Block') -> None:
+        """Rotate the block of this move back.
+        """
+        block_at(board, self.path).rotate(4 - self.direction)
+
+    def permutation(self) -> Optional[Tuple[int, int, int, int]]:
+        return ROTATIONS.get(self.direction)
+
+    def _key(self) -> tuple:
+        return type(self).__name__, self.path, self.direction
+
+
+class Swap(Move):
+    """A swap of the children of a block, horizontally or vertically.
+
+    === Public Attributes ===
+    direction:
+        HORIZONTAL or VERTICAL, as understood by Block.swap.
+    """
+    direction: int
+
+    def __init__(self, path: Path, direction: int) -> None:
+        """Initialize this move to swap the children of the block at <path>
+        in <direction>.
+        """
+        super().__init__(path)
+        self.direction = direction
+
+    def apply(self, board: 'Block') -> bool:
+        """Swap the children of the block of this move.  This is always
+        legal.
+        """
+        block_at(board, self.path).swap(self.direction)
+        return True
+
+    def undo(self, board: 'Block') -> None:
+        """Swap the children of the block of this move back.
+        """
+        block_at(board, self.path).swap(self.direction)
+
+    def permutation(self) -> Optional[Tuple[int, int, int, int]]:
+        return SWAPS.get(self.direction)
+
+    def _key(self) -> tuple:
+        return type(self).__name__, self.path, self.direction
+
+
+class Smash(Move):
+    """A smash of a block into four new random children.
+
+    The first time a Smash is applied, its random outcome is recorded, so
+    applying it again after undoing it (for example through
+    MoveJournal.redo) reproduces the same board.
+
+    === Public Attributes ===
+    rng:
+        The random number generator that the smash draws from, or None for
+        the random module.
+    """
+    # === Private Attributes ===
+    # _before:
+    #     The colour and children of the block before it was smashed, or
+    #     None if this move is not currently applied.
+    # _after:
+    #     The children that the smash produced, or None if this move was
+    #     never applied.
+    rng: Optional[random.Random]
+    _before: Optional[Tuple[Optional[Tuple[int, int, int]], List['Block']]]
+    _after: Optional[List['Block']]
+
+    def __init__(self, path: Path,
+                 rng: Optional[random.Random] = None) -> None:
+        """Initialize this move to smash the block at <path>, drawing from
+        <rng>.
+        """
+        super().__init__(path)
+        self.rng = rng
+        self._before = None
+        self._after = None
+
+    def apply(self, board: 'Block') -> bool:
+        """Smash the block of this move, unless that is not allowed.
+        """
+        block = block_at(board, self.path)
+        before = (block.colour, list(block.children))
+        if self._after is not None:
+            block.replace_contents(None, self._after)
+        elif block.smash(self.rng):
+            self._after = list(block.children)
+        else:
+            return False
+        self._before = before
+        return True
+
+    def undo(self, board: 'Block') -> None:
+        """Put back the block's colour and children from before the smash.
+        """
+        colour, children = self._before
+        block_at(board, self.path).replace_contents(colour, children)
+        self._before = None
+
+
+class MoveJournal:
+    """A record of the moves applied to a board, supporting undo and redo.
+
+    All moves must be applied to and undone from the same board, through
+    this journal.
+    """
+    # === Private Attributes ===
+    # _done:
+    #     The moves applied so far, oldest first.
+    # _undone:
+    #     The moves that were undone and can be redone, most recently
+    #     undone last.
+    _done: List[Move]
+    _undone: List[Move]
+
+    def __init__(self) -> None:
+        """Initialize this journal with no moves.
+        """
+        self._done = []
+        self._undone = []
+
+    def __len__(self) -> int:
+        """Return the number of moves currently applied.
+        """
+        return len(self._done)
+
+    def history(self) -> List[Move]:
+        """Return the moves currently applied, oldest first.
+        """
+        return list(self._done)
+
+    def apply(self, board: 'Block', move: Move) -> bool:
+        """Apply <move> to <board> and record it, if it is legal.
+
+        Applying a move discards the moves that could be redone.  Return
+        True iff the move was applied.
+        """
+        if not move.apply(board):
+            return False
+        self._done.append(move)
+        self._undone.clear()
+        return True
+
+    def undo(self, board: 'Block') -> Optional[Move]:
+        """Undo the last applied move on <board> and return it, or return
+        None if there is nothing to undo.
+        """
+        if not self._done:
+            return None
+        move = self._done.pop()
+        move.undo(board)
+        self._undone.append(move)
+        return move
+
+    def redo(self, board: 'Block') -> Optional[Move]:
+        """Reapply the last undone move on <board> and return it, or return
+        None if there is nothing to redo.
+        """
+        if not self._undone:
+            return None
+        move = self._undone.pop()
+        move.apply(board)
+        self._done.append(move)
+        return move
+
+    def mark(self) -> int:
+        """Return a mark for the current state of the board, for rollback.
+        """
+        return len(self._done)
+
+    def rollback(self, board: 'Block', mark: int) -> None:
+        """Undo every move applied to <board> since <mark> was taken.
+        """
+        while len(self._done) > mark:
+            self.undo(board)
@@ -0,0 +1,40 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains the colours and board dimensions of the game.  It does
+not depend on pygame, so the game logic can be used without it; the
+renderer module re-exports everything defined here.
+"""
+from typing import Tuple
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+PACIFIC_POINT = (1, 128, 181)
+OLD_OLIVE = (138, 151, 71)
+REAL_RED = (199, 44, 58)
+MELON_MAMBO = (234, 62, 112)
+DAFFODIL_DELIGHT = (255, 211, 92)
+TEMPTING_TURQUOISE = (75, 196, 213)
+COLOUR_LIST = [PACIFIC_POINT, REAL_RED, OLD_OLIVE, DAFFODIL_DELIGHT]
+COLOUR_NAMES = ['Pacific Point', 'Real Red', 'Old Olive', 'Daffodil Delight']
+
+BOARD_WIDTH = 750
+BOARD_HEIGHT = 750
+TEXT_HEIGHT = 75
+
+
+def colour_name(colour: Tuple[int, int, int]) -> str:
+    """Return the colour name associated with this colour value, or
+    the empty string if this colour value isn't in our colour list.
+    """
+    for i in range(len(COLOUR_LIST)):
+        if COLOUR_LIST[i] == colour:
+            return COLOUR_NAMES[i]
+    return ''
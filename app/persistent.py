@@ -0,0 +1,286 @@
+"""Assignment 2 - Blocky
+
+=== Module Description ===
+
+This file contains the PersistentBlock class, an immutable counterpart of
+Block for searching through many candidate boards.
+
+A move on a PersistentBlock never changes it.  Instead it returns a new
+top-level block that shares every untouched subtree with the original, so
+a candidate board costs only one new node per level of the moved block,
+and any number of threads or processes can branch from the same board
+without locking.
+
+Blocks within a PersistentBlock are addressed by paths: tuples of child
+indices (in the Block.children order) leading from the top-level block
+down to the block in question.  The empty path is the top-level block.
+"""
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.block import (Block, BlobSummary, COLOUR_INDEX, ROTATIONS, SWAPS,
+                       random_init, colour_hash, combine_hashes)
+from app.move import Move, Smash
+
+Path = Tuple[int, ...]
+
+
+class PersistentBlock:
+    """An immutable square block in the Blocky game.
+
+    === Public Attributes ===
+    colour:
+        The colour of this block if it is not subdivided, or None.
+    children:
+        The blocks into which this block is subdivided, in the same order
+        as Block.children, or an empty tuple.
+    level:
+        The level of this block within the overall block structure.
+    max_depth:
+        The deepest level allowed in the overall block structure.
+
+    === Private Attributes ===
+    _hash:
+        The board hash of this block, equal to that of the equivalent Block.
+    _flattened:
+        The memoized result of flatten, or None if it was never computed.
+    _summaries:
+        The memoized results of blob_summary, by colour.
+
+    === Representation Invariants ===
+    - The representation invariants of Block that do not concern position,
+      size, highlighted or parent hold.
+    - No attribute changes after initialization, except that _flattened
+      may be filled in once and _summaries may gain entries.
+    """
+    __slots__ = ('colour', 'children', 'level', 'max_depth', '_hash',
+                 '_flattened', '_summaries')
+    colour: Optional[Tuple[int, int, int]]
+    children: Tuple['PersistentBlock', ...]
+    level: int
+    max_depth: int
+    _hash: int
+    _flattened: Optional[List[List[Tuple[int, int, int]]]]
+    _summaries: Dict[Tuple[int, int, int], BlobSummary]
+
+    def __init__(self, level: int, max_depth: int,
+                 colour: Optional[Tuple[int, int, int]] = None,
+                 children: Tuple['PersistentBlock', ...] = ()) -> None:
+        """Initialize this block at <level> of a board with <max_depth>,
+        either undivided with <colour> or subdivided into <children>.
+        """
+        set_slot = object.__setattr__
+        set_slot(self, 'level', level)
+        set_slot(self, 'max_depth', max_depth)
+        set_slot(self, 'children', tuple(children))
+        set_slot(self, 'colour', None if children else colour)
+        if children:
+            set_slot(self, '_hash',
+                     combine_hashes([child._hash for child in children]))
+        else:
+            set_slot(self, '_hash', colour_hash(colour))
+        set_slot(self, '_flattened', None)
+        set_slot(self, '_summaries', {})
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError('PersistentBlock is immutable')
+
+    def board_hash(self) -> int:
+        """Return the board hash of this block, which is the same as that
+        of an equal Block.
+        """
+        return self._hash
+
+    def get(self, path: Path) -> 'PersistentBlock':
+        """Return the block at <path> within this block.
+        """
+        block = self
+        for index in path:
+            block = block.children[index]
+        return block
+
+    def _replace(self, path: Path,
+                 change: Callable[['PersistentBlock'],
+                                  'PersistentBlock']) -> 'PersistentBlock':
+        """Return a copy of this block in which the block at <path> is
+        replaced by change(<that block>), sharing all other subtrees.
+        """
+        if not path:
+            return change(self)
+        index = path[0]
+        children = list(self.children)
+        children[index] = children[index]._replace(path[1:], change)
+        return PersistentBlock(self.level, self.max_depth,
+                               children=tuple(children))
+
+    def _reorder(self, path: Path,
+                 order: Tuple[int, int, int, int]) -> 'PersistentBlock':
+        """Return a copy of this block in which the children of the block at
+        <path> are in the order given by <order>, or this block itself if
+        the block at <path> has no children.
+        """
+        if not self.get(path).children:
+            return self
+
+        def reorder(block: PersistentBlock) -> PersistentBlock:
+            return PersistentBlock(
+                block.level, block.max_depth,
+                children=tuple(block.children[i] for i in order))
+        return self._replace(path, reorder)
+
+    def rotate(self, path: Path, direction: int) -> 'PersistentBlock':
+        """Return this board with the block at <path> rotated.
+
+        If <direction> is 1, rotate clockwise.  If <direction> is 3, rotate
+        counterclockwise.  If the block has no children, return this board.
+        """
+        if direction not in ROTATIONS:
+            return self
+        return self._reorder(path, ROTATIONS[direction])
+
+    def swap(self, path: Path, direction: int) -> 'PersistentBlock':
+        """Return this board with the children of the block at <path>
+        swapped.
+
+        If <direction> is 1, swap vertically.  If <direction> is 0, swap
+        horizontally.  If the block has no children, return this board.
+        """
+        if direction not in SWAPS:
+            return self
+        return self._reorder(path, SWAPS[direction])
+
+    def smash(self, path: Path,
+              rng: Optional[random.Random] = None) -> 'PersistentBlock':
+        """Return this board with the block at <path> smashed into four new
+        children randomly generated with <rng>, or with the random module if
+        it is None.
+
+        As with Block.smash, the top-level block and blocks at max_depth
+        cannot be smashed; for those, return this board itself.
+        """
+        target = self.get(path)
+        if target.level == 0 or target.level == target.max_depth:
+            return self
+
+        def smash(block: PersistentBlock) -> PersistentBlock:
+            children = tuple(
+                PersistentBlock.from_block(
+                    random_init(block.level + 1, block.max_depth, rng))
+                for _ in range(4))
+            return PersistentBlock(block.level, block.max_depth,
+                                   children=children)
+        return self._replace(path, smash)
+
+    def play(self, move: Move) -> 'PersistentBlock':
+        """Return this board with <move> applied to it, or this board itself
+        if <move> does not change it.
+
+        A Smash draws from its own random number generator, so playing the
+        same Smash twice gives different boards.
+        """
+        if isinstance(move, Smash):
+            return self.smash(move.path, move.rng)
+        order = move.permutation()
+        if order is None:
+            return self
+        return self._reorder(move.path, order)
+
+    def flatten(self) -> List[List[Tuple[int, int, int]]]:
+        """Return a two-dimensional list representing this block as rows
+        and columns of unit cells, in the same format as Block.flatten.
+        """
+        return [column[:] for column in self._flatten_grid()]
+
+    def _flatten_grid(self) -> List[List[Tuple[int, int, int]]]:
+        """Return the memoized flattened form of this block, which is shared
+        with every board containing this block and must not be mutated.
+        """
+        if self._flattened is None:
+            size = 2 ** (self.max_depth - self.level)
+            if not self.children:
+                grid = [[self.colour] * size for _ in range(size)]
+            else:
+                upper_right, upper_left, lower_left, lower_right = \
+                    [child._flatten_grid() for child in self.children]
+                grid = [upper_left[i] + lower_left[i]
+                        for i in range(size // 2)]
+                grid.extend(upper_right[i] + lower_right[i]
+                            for i in range(size // 2))
+            object.__setattr__(self, '_flattened', grid)
+        return self._flattened
+
+    def blob_summary(self, colour: Tuple[int, int, int]) -> BlobSummary:
+        """Return the BlobSummary of the cells of <colour> within this block,
+        as Block.blob_summary does.
+
+        Summaries are memoized, and every board containing this block shares
+        them.  The result must not be mutated.
+        """
+        summary = self._summaries.get(colour)
+        if summary is None:
+            if self.children:
+                summary = BlobSummary.merge(
+                    [child.blob_summary(colour) for child in self.children])
+            else:
+                summary = BlobSummary.leaf(
+                    2 ** (self.max_depth - self.level), self.colour == colour)
+            self._summaries[colour] = summary
+        return summary
+
+    def flatten_array(self) -> np.ndarray:
+        """Return this block as a square array of unit cells, in the same
+        format as Block.flatten_array.
+
+        Raise a ValueError if this block contains a colour that is not in
+        COLOUR_LIST.
+        """
+        size = 2 ** (self.max_depth - self.level)
+        grid = np.zeros((size, size), dtype=np.uint8)
+        stack = [(self, 0, 0, size)]
+        while stack:
+            block, x, y, size = stack.pop()
+            if not block.children:
+                if block.colour not in COLOUR_INDEX:
+                    raise ValueError(
+                        f'colour {block.colour} is not in COLOUR_LIST')
+                grid[x:x + size, y:y + size] = COLOUR_INDEX[block.colour]
+                continue
+            half = size // 2
+            offsets = [(x + half, y), (x, y), (x, y + half),
+                       (x + half, y + half)]
+            for child, (child_x, child_y) in zip(block.children, offsets):
+                stack.append((child, child_x, child_y, half))
+        return grid
+
+    @classmethod
+    def from_block(cls, block: Block) -> 'PersistentBlock':
+        """Return a PersistentBlock with the same structure and colours as
+        <block>.
+        """
+        if not block.children:
+            return cls(block.level, block.max_depth, block.colour)
+        return cls(block.level, block.max_depth,
+                   children=tuple(cls.from_block(child)
+                                  for child in block.children))
+
+    def to_block(self, top_left: Tuple[int, int] = (0, 0),
+                 size: int = 0) -> Block:
+        """Return a new mutable Block equal to this block, located at
+        <top_left> with the given <size>.
+        """
+        block = self._build_block()
+        block.update_block_locations(top_left, size)
+        return block
+
+    def _build_block(self) -> Block:
+        """Return a new tree of Blocks equal to this block.
+        """
+        if self.children:
+            block = Block(self.level, children=[
+                child._build_block() for child in self.children])
+            for child in block.children:
+                child.max_depth = self.max_depth
+        else:
+            block = Block(self.level, self.colour)
+        block.max_depth = self.max_depth
+        return block
@@ -11,15 +11,31 @@ University of Toronto
 This file contains the player class hierarchy.
 """
 
+import heapq
+import itertools
+import math
 import random
-from typing import Optional
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import (Dict, Iterable, Iterator, List, Optional, Sequence,
+                    Tuple, Union)
 import pygame
+from app import snapshot
 from app.renderer import Renderer
-from app.block import Block
-from app.goal import Goal
+from app.block import Block, TOP, RIGHT, BOTTOM, LEFT
+from app.goal import Goal, ScoreCache
+from app.persistent import PersistentBlock
+from app.move import (Move, MoveJournal, Rotate, Swap, Smash, block_at,
+                      block_moves, block_path, generate_moves, CLOCKWISE,
+                      COUNTERCLOCKWISE, HORIZONTAL, VERTICAL)
 
 TIME_DELAY = 600
 
+# The edges of its parent that each child of a Block shares, in the
+# Block.children order, as bit masks over TOP, RIGHT, BOTTOM and LEFT.
+_CHILD_EDGES = (1 << TOP | 1 << RIGHT, 1 << TOP | 1 << LEFT,
+                1 << BOTTOM | 1 << LEFT, 1 << BOTTOM | 1 << RIGHT)
+
 
 class Player:
     """A player in the Blocky game.
@@ -35,10 +51,24 @@ class Player:
         for example as "Player 2"
     goal:
         This player's assigned goal for the game.
+    journal:
+        The journal through which this player applies its moves.  A Game
+        gives all of its players the same journal.
+    score_cache:
+        The cache through which this player scores boards.  A Game gives
+        all of its players the same cache.
+    rng:
+        The random number generator behind every random choice of this
+        player, including the outcome of its smashes.  A Game gives each
+        player its own generator, derived from the game's seed; otherwise
+        it is seeded from the random module.
     """
     renderer: Renderer
     id: int
     goal: Goal
+    journal: MoveJournal
+    score_cache: ScoreCache
+    rng: random.Random
 
     def __init__(self, renderer: Renderer, player_id: int, goal: Goal) -> None:
         """Initialize this Player.
@@ -46,6 +76,9 @@ class Player:
         self.goal = goal
         self.renderer = renderer
         self.id = player_id
+        self.journal = MoveJournal()
+        self.score_cache = ScoreCache()
+        self.rng = random.Random(random.getrandbits(64))
 
     def make_move(self, board: Block) -> int:
         """Choose a move to make on the given board, and apply it, mutating
@@ -55,6 +88,27 @@ class Player:
         """
         raise NotImplementedError
 
+    def _play(self, board: Block, move: Move) -> None:
+        """Apply <move> to <board> through the journal.
+
+        If the renderer is interactive, the block of <move> is highlighted
+        and shown for TIME_DELAY milliseconds first, and the board is drawn
+        again afterwards; otherwise nothing is drawn and nobody waits.
+        """
+        if not self.renderer.interactive:
+            self.journal.apply(board, move)
+            return
+        block = block_at(board, move.path)
+        block.highlighted = True
+        self.renderer.draw(board, self.id)
+
+        pygame.time.wait(TIME_DELAY)
+
+        self.journal.apply(board, move)
+
+        block.highlighted = False
+        self.renderer.draw(board, self.id)
+
 
 class HumanPlayer(Player):
     """A human player.
@@ -132,7 +186,7 @@ class HumanPlayer(Player):
         self._level = block.level
 
         if event.type == pygame.MOUSEBUTTONDOWN:
-            block.rotate(event.button)
+            self.journal.apply(board, Rotate(block_path(block), event.button))
             return 1
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_UP:
@@ -146,18 +200,18 @@ class HumanPlayer(Player):
                 return None
 
             elif event.key == pygame.K_h:
-                block.swap(0)
+                self.journal.apply(board, Swap(block_path(block), HORIZONTAL))
                 return 1
 
             elif event.key == pygame.K_v:
-                block.swap(1)
+                self.journal.apply(board, Swap(block_path(block), VERTICAL))
                 return 1
 
             elif event.key == pygame.K_s:
                 if self.num_smashes >= self.MAX_SMASHES:
                     print('Can\'t smash again!')
                     return 0
-                if block.smash():
+                if self.journal.apply(board, Smash(block_path(block), self.rng)):
                     self.num_smashes += 1
                     return 1
                 else:
@@ -219,41 +273,22 @@ class RandomPlayer(Player):
         Return 0 upon successful completion of a move, and 1 upon a QUIT event.
         """
         random_block = self._choose_random_block(board)
-
-        random_block.highlighted = True
-        self.renderer.draw(board, self.id)
-
-        pygame.time.wait(TIME_DELAY)
-
-        action_type = random.randint(0, 4)
-
-        if action_type == 0:
-            random_block.rotate(1)
-        elif action_type == 1:
-            random_block.rotate(3)
-        elif action_type == 2:
-            random_block.swap(0)
-        elif action_type == 3:
-            random_block.swap(1)
-        else:
-            random_block.smash()
-
-        random_block.highlighted = False
-        self.renderer.draw(board, self.id)
-
+        action_type = self.rng.randint(0, 4)
+        self._play(board, _action(block_path(random_block), action_type,
+                                  self.rng))
         return 0
 
     def _choose_random_block(self, board: Block) -> Block:
         """Choose a random block on the board."""
         max_depth = board.max_depth
         
-        depth = random.randint(0, max_depth - 1)
+        depth = self.rng.randint(0, max_depth - 1)
         
         curr_block = board
         curr_depth = 0
         
         while curr_depth < depth and len(curr_block.children) > 0:
-            curr_block = random.choice(curr_block.children)
+            curr_block = self.rng.choice(curr_block.children)
             curr_depth += 1
             
         return curr_block
@@ -277,21 +312,48 @@ class SmartPlayer(Player):
            This player's assigned goal for the game.
        difficulty:
            How many moves this player considers before choosing one.
+       workers:
+           The number of processes among which candidate moves are scored,
+           or 0 to score them all in this process.  The chosen move is the
+           same either way.
+       time_budget:
+           The number of seconds this player may spend choosing a move, or
+           None.  With a budget, difficulty and workers are ignored:
+           distinct moves are generated and scored best-first, as ordered
+           by _best_first, and the best move found when the budget runs
+           out is made.  Only the first move may be scored after the
+           deadline, which matters on the first turn of a BlobGoal, when
+           the blob summaries of the whole board are built.
+       turn_stats:
+           For each turn of this player, the number of candidates it scored
+           and the number of seconds it spent choosing its move.
        """
 
     # === Private Attributes ===
     # _difficulty_moves_map:
     #     A dictionary mapping difficulty levels to number of moves to consider
+    # _pool:
+    #     The process pool used when workers > 0, started on first use.
     _difficulty_moves_map: dict[int, int]
+    _pool: Optional[ProcessPoolExecutor]
     difficulty: int
+    workers: int
+    time_budget: Optional[float]
+    turn_stats: List[Tuple[int, float]]
 
     def __init__(self, renderer: Renderer, player_id: int, goal: Goal,
-               difficulty: int) -> None:
+               difficulty: int, workers: int = 0,
+               time_budget: Optional[float] = None) -> None:
         """Initialize this SmartPlayer with the given <renderer>, <player_id>,
-        <goal>, and <difficulty>.
+        <goal>, and <difficulty>, scoring candidates with <workers>
+        processes, or within <time_budget> seconds.
         """
         super().__init__(renderer, player_id, goal)
         self.difficulty = difficulty
+        self.workers = workers
+        self.time_budget = time_budget
+        self.turn_stats = []
+        self._pool = None
 
         # Initialize the difficulty to moves map
         self._difficulty_moves_map = {
@@ -309,86 +371,665 @@ class SmartPlayer(Player):
 
         Return 0 upon successful completion of a move, and 1 upon a QUIT event.
         """
+        start = time.perf_counter()
+        if self.time_budget is not None:
+            deadline = start + self.time_budget
+            best_move, evaluated = self._best_move_until(
+                board, self._best_first(board, deadline), deadline)
+        else:
+            candidates = generate_moves(board)
+            if self.difficulty > 5:
+                moves_to_consider = 150
+            else:
+                moves_to_consider = \
+                    self._difficulty_moves_map[self.difficulty]
 
-        if self.difficulty > 5:
-            moves_to_consider = 150
+            # Considerar cada movimiento distinto una sola vez, o una muestra
+            # sin repeticiones si hay demasiados
+            if len(candidates) > moves_to_consider:
+                candidates = self.rng.sample(candidates,
+                                             moves_to_consider)
+            best_move = self._best_move(board, candidates)
+            evaluated = len(candidates)
+        self.turn_stats.append((evaluated, time.perf_counter() - start))
+
+        if best_move is not None:
+            self._play(board, best_move)
+
+        return 0
+
+    def _best_move(self, board: Block,
+                   candidates: List[Move]) -> Optional[Move]:
+        """Return the candidate with the highest score after it is applied
+        to <board>, the earliest one among equals, or None if there are no
+        candidates.  <board> is left unchanged.
+        """
+        if self.workers > 0 and len(candidates) > 1:
+            scores = self._parallel_scores(board, candidates)
         else:
-            moves_to_consider = self._difficulty_moves_map[self.difficulty]
+            # Evaluar cada movimiento sin aplicarlo al tablero
+            scores = [self.score_cache.score_after(self.goal, board, move)
+                      for move in candidates]
 
         best_score = -1
         best_move = None
-        best_block = None
+        for move, new_score in zip(candidates, scores):
+            if new_score > best_score:
+                best_score = new_score
+                best_move = move
+        return best_move
+
+    def _best_first(self, board: Block, deadline: float) -> Iterator[Move]:
+        """Yield the distinct moves on <board>, each once, in the order in
+        which to score them under a time budget, the most promising first,
+        and stop once time.perf_counter() reaches <deadline>.
+
+        Blocks are taken from a heap by Goal.block_estimate of this
+        player's goal, bigger blocks first among equals.  Moves are only
+        generated, and children only estimated, when their block is taken,
+        so the work done before each move is yielded stays small.  The
+        moves of a block are yielded together: those whose score after the
+        move is already in the score cache first, best score first, then
+        the others.
+        """
+        order = itertools.count()
+        heap = [(0, 0, next(order), board, (), 0b1111)]
+        while heap:
+            _, _, _, block, path, edges = heapq.heappop(heap)
+            known = []
+            unknown = []
+            for move in block_moves(block, path):
+                score = self.score_cache.cached_after(self.goal, board, move)
+                if score is None:
+                    unknown.append(move)
+                else:
+                    known.append((-score, move))
+            known.sort(key=lambda pair: pair[0])
+            yield from (move for _, move in known)
+            yield from unknown
+
+            for index, child in enumerate(block.children):
+                if time.perf_counter() >= deadline:
+                    return
+                if not child.children:
+                    continue
+                child_edges = edges & _CHILD_EDGES[index]
+                estimate = self.goal.block_estimate(child, child_edges != 0)
+                heapq.heappush(heap, (-estimate, len(path) + 1, next(order),
+                                      child, path + (index,), child_edges))
+
+    def _best_move_until(self, board: Block, candidates: Iterable[Move],
+                         deadline: float) -> Tuple[Optional[Move], int]:
+        """Return the best of <candidates>, as _best_move does, among those
+        scored before time.perf_counter() reaches <deadline>, together with
+        the number of candidates scored.  At least one candidate is scored
+        if there is any.
+        """
+        best_score = -1
+        best_move = None
+        evaluated = 0
+        for move in candidates:
+            if evaluated and time.perf_counter() >= deadline:
+                break
+            new_score = self.score_cache.score_after(self.goal, board, move)
+            evaluated += 1
+            if new_score > best_score:
+                best_score = new_score
+                best_move = move
+        return best_move, evaluated
 
-        current_score = self.goal.score(board)
+    def _parallel_scores(self, board: Block,
+                         candidates: List[Move]) -> List[int]:
+        """Return the score after each of <candidates>, computed by the
+        process pool.
 
-        for _ in range(moves_to_consider):
-            block = self._choose_random_block(board)
+        The candidates are split into one contiguous chunk per worker, and
+        each chunk is sent with the board in the snapshot format.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+        data = snapshot.dumps(board)
+        chunk = -(-len(candidates) // self.workers)
+        futures = [self._pool.submit(_score_candidates, data, self.goal,
+                                     candidates[i:i + chunk])
+                   for i in range(0, len(candidates), chunk)]
+        return [score for future in futures for score in future.result()]
+
+    def close(self) -> None:
+        """Shut down the process pool of this player, if it was started.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class SearchPlayer(Player):
+    """A computer player that looks several moves ahead.
+
+    A SearchPlayer searches the moves of every player in turn, one ply
+    deeper at a time, until it has searched <depth> plies or its time limit
+    runs out, and makes the best move of the deepest search it completed.
+    The search one ply deep is always completed.  Against a single opponent it maximizes the
+    difference between its own score and the opponent's, with alpha-beta
+    pruning; with more players each one is assumed to maximize its own
+    score (max-n).  At every node only the most promising moves, according
+    to the score of the player to move right after them, are searched.
+    The search runs on a PersistentBlock, so every board it reaches shares
+    its untouched subtrees, and their memoized blob summaries, with the
+    board it came from, and nothing has to be undone.
+    Like a SmartPlayer, a SearchPlayer cannot perform smash moves.
 
-            action_type = random.randint(0, 3)
+    === Public Attributes ===
+    depth:
+        The greatest number of plies searched, counting this player's move.
+    width:
+        The number of moves searched at each node.
+    time_limit:
+        The number of seconds this player may spend choosing a move, or
+        None to always search <depth> plies.
+    reached_depth:
+        The number of plies of the deepest search completed on the last
+        turn of this player.
+    goals:
+        The goals of all players in the game, indexed by player id.  A Game
+        sets this; until then, only this player's goal is considered.
+    """
+    # === Private Attributes ===
+    # _table:
+    #     The transposition table of the current turn, mapping a board
+    #     hash, the index of the player to move and the remaining depth to
+    #     what was learned about that position.
+    # _deadline:
+    #     The time.perf_counter() value at which the current search must
+    #     stop, or None if it may run to completion.
+    depth: int
+    width: int
+    time_limit: Optional[float]
+    reached_depth: int
+    goals: List[Goal]
+    _table: Dict[Tuple[int, int, int], tuple]
+    _deadline: Optional[float]
 
-            if action_type == 0:
-                block.rotate(1)
-                move_type = "rotate_cw"
-            elif action_type == 1:
-                block.rotate(3)
-                move_type = "rotate_ccw"
-            elif action_type == 2:
-                block.swap(0)
-                move_type = "swap_h"
-            else:
-                block.swap(1)
-                move_type = "swap_v"
+    def __init__(self, renderer: Renderer, player_id: int, goal: Goal,
+                 depth: int = 2, width: int = 8,
+                 time_limit: Optional[float] = 0.5) -> None:
+        """Initialize this SearchPlayer to search up to <depth> plies within
+        <time_limit> seconds, keeping <width> moves at each node.
+        """
+        super().__init__(renderer, player_id, goal)
+        self.depth = depth
+        self.width = width
+        self.time_limit = time_limit
+        self.reached_depth = 0
+        self.goals = []
+        self._table = {}
+        self._deadline = None
 
-            new_score = self.goal.score(board)
+    def make_move(self, board: Block) -> int:
+        """Choose the best move to make on the given board, and apply it,
+        mutating the Board as appropriate.
 
-            if new_score > best_score:
-                best_score = new_score
-                best_move = move_type
-                best_block = block
+        Return 0 upon successful completion of a move, and 1 upon a QUIT event.
+        """
+        best_move = self.choose_move(board)
+        if best_move is not None:
+            self._play(board, best_move)
+        return 0
 
-            if move_type == "rotate_cw":
-                block.rotate(3)
-            elif move_type == "rotate_ccw":
-                block.rotate(1)
-            elif move_type == "swap_h":
-                block.swap(0)
-            elif move_type == "swap_v":
-                block.swap(1)
+    def choose_move(self, board: Block) -> Optional[Move]:
+        """Return the move this player would make on <board>, or None if no
+        move changes it.  <board> is left unchanged.
+        """
+        goals = self.goals if len(self.goals) > 1 else [self.goal]
+        me = self.id if len(self.goals) > 1 else 0
+        deadline = None if self.time_limit is None \
+            else time.perf_counter() + self.time_limit
+        self._table = {}
+        self.reached_depth = 0
+        root = PersistentBlock.from_block(board)
+        moves = self._ordered_moves(root, goals, me)
+        best_move = None
+        for depth in range(1, self.depth + 1):
+            if not moves:
+                break
+            self._deadline = deadline if depth > 1 else None
+            try:
+                best_move = self._best_move(root, goals, me, moves, depth)
+            except _OutOfTime:
+                break
+            self.reached_depth = depth
+            # La mejor jugada de esta profundidad se busca primero en la
+            # siguiente, para podar más
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+        self._deadline = None
+        return best_move
+
+    def _best_move(self, root: PersistentBlock, goals: List[Goal], me: int,
+                   moves: List[Move], depth: int) -> Move:
+        """Return the best of <moves> for player <me> on <root> when
+        searching <depth> plies, the earliest one among equals.
+
+        Raise _OutOfTime if the deadline of the search passes.
+        """
+        best_move = None
+        best_value = None
+        for move in moves:
+            child = root.play(move)
+            if len(goals) == 2:
+                # Moves no better than the best so far need not be exact.
+                bound = float('inf') if best_value is None else -best_value
+                value = -self._alpha_beta(child, goals, 1 - me, depth - 1,
+                                          float('-inf'), bound)
+            else:
+                value = self._max_n(child, goals, (me + 1) % len(goals),
+                                    depth - 1)[me]
+            if best_value is None or value > best_value:
+                best_value = value
+                best_move = move
+        return best_move
+
+    def _check_time(self) -> None:
+        """Raise _OutOfTime if the deadline of the current search passed.
+        """
+        if self._deadline is not None and \
+                time.perf_counter() >= self._deadline:
+            raise _OutOfTime
+
+    def _ordered_moves(self, board: PersistentBlock, goals: List[Goal],
+                       mover: int) -> List[Move]:
+        """Return the moves of player <mover> to search on <board>: the
+        <width> distinct moves with the best immediate score for its goal,
+        best first and in generation order among equals.
+        """
+        goal = goals[mover]
+        moves = generate_moves(board)
+        scores = [self.score_cache.score_after(goal, board, move)
+                  for move in moves]
+        ranked = sorted(range(len(moves)), key=lambda i: -scores[i])
+        return [moves[i] for i in ranked[:self.width]]
+
+    def _scores(self, board: PersistentBlock,
+                goals: List[Goal]) -> Tuple[int, ...]:
+        """Return the score of every goal in <goals> on <board>.
+        """
+        return tuple(self.score_cache.score(goal, board) for goal in goals)
+
+    def _alpha_beta(self, board: PersistentBlock, goals: List[Goal],
+                    mover: int, depth: int, alpha: float,
+                    beta: float) -> float:
+        """Return the value of <board> for player <mover>, its score minus
+        its opponent's, when both search <depth> more plies, assuming the
+        value lies between <alpha> and <beta>.
+        """
+        self._check_time()
+        key = (board.board_hash(), mover, depth)
+        entry = self._table.get(key)
+        if entry is not None:
+            lower, upper = entry
+            if lower >= beta or lower == upper:
+                return lower
+            if upper <= alpha:
+                return upper
+            alpha = max(alpha, lower)
+            beta = min(beta, upper)
+
+        moves = self._ordered_moves(board, goals, mover) if depth > 0 else []
+        if not moves:
+            scores = self._scores(board, goals)
+            value = scores[mover] - scores[1 - mover]
+            self._table[key] = (value, value)
+            return value
+
+        start_alpha = alpha
+        best = float('-inf')
+        for move in moves:
+            value = -self._alpha_beta(board.play(move), goals, 1 - mover,
+                                      depth - 1, -beta, -alpha)
+            best = max(best, value)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
 
+        # The value is exact only if it fell strictly inside the window.
+        if best <= start_alpha:
+            self._table[key] = (float('-inf'), best)
+        elif best >= beta:
+            self._table[key] = (best, float('inf'))
+        else:
+            self._table[key] = (best, best)
+        return best
+
+    def _max_n(self, board: PersistentBlock, goals: List[Goal], mover: int,
+               depth: int) -> Tuple[int, ...]:
+        """Return the scores of all players on the board reached from
+        <board> when player <mover> moves first and every player maximizes
+        its own score over <depth> more plies.
+        """
+        self._check_time()
+        key = (board.board_hash(), mover, depth)
+        if key in self._table:
+            return self._table[key]
+
+        moves = self._ordered_moves(board, goals, mover) if depth > 0 else []
+        best = None
+        for move in moves:
+            scores = self._max_n(board.play(move), goals,
+                                 (mover + 1) % len(goals), depth - 1)
+            if best is None or scores[mover] > best[mover]:
+                best = scores
+        if best is None:
+            best = self._scores(board, goals)
+        self._table[key] = best
+        return best
+
+
+class MCTSPlayer(Player):
+    """A computer player that chooses moves by Monte Carlo tree search.
+
+    An MCTSPlayer grows a search tree over the moves of all players with
+    UCT until a wall-clock deadline, and then makes the move it explored
+    most.  Every iteration ends with a rollout of a few moves, random or
+    greedy, whose final scores are credited to the moves leading to it.
+    A smash is a chance node: each visit smashes anew, and the boards it
+    leads to are kept apart.  The part of the tree that is still reachable
+    is kept from one turn to the next.
 
-        if best_move is not None and best_block is not None:
+    === Public Attributes ===
+    time_limit:
+        The number of seconds spent searching on each turn.
+    max_iterations:
+        The greatest number of iterations per turn, or None for no limit.
+    rollout_depth:
+        The number of moves played in each rollout.
+    greedy:
+        True iff rollouts play the best of a few random moves for the
+        player to move, rather than a random move.
+    exploration:
+        The exploration constant of UCT.
+    goals:
+        The goals of all players in the game, indexed by player id.  A Game
+        sets this; until then, only this player's goal is considered.
+    """
+    # === Private Attributes ===
+    # _root:
+    #     The root of the search tree kept from the last turn, or None.
+    time_limit: float
+    max_iterations: Optional[int]
+    rollout_depth: int
+    greedy: bool
+    exploration: float
+    goals: List[Goal]
+    _root: Optional['_Node']
 
-            best_block.highlighted = True
-            self.renderer.draw(board, self.id)
+    def __init__(self, renderer: Renderer, player_id: int, goal: Goal,
+                 time_limit: float = 0.5,
+                 max_iterations: Optional[int] = None,
+                 rollout_depth: int = 4, greedy: bool = False,
+                 exploration: float = 1.4) -> None:
+        """Initialize this MCTSPlayer to search for <time_limit> seconds,
+        and at most <max_iterations> iterations, per turn.
+        """
+        super().__init__(renderer, player_id, goal)
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.rollout_depth = rollout_depth
+        self.greedy = greedy
+        self.exploration = exploration
+        self.goals = []
+        self._root = None
 
-            pygame.time.wait(TIME_DELAY)
+    def make_move(self, board: Block) -> int:
+        """Choose the best move to make on the given board, and apply it,
+        mutating the Board as appropriate.
 
-            if best_move == "rotate_cw":
-                best_block.rotate(1)
-            elif best_move == "rotate_ccw":
-                best_block.rotate(3)
-            elif best_move == "swap_h":
-                best_block.swap(0)
-            elif best_move == "swap_v":
-                best_block.swap(1)
+        Return 0 upon successful completion of a move, and 1 upon a QUIT event.
+        """
+        best_move = self.choose_move(board)
+        if best_move is not None:
+            self._play(board, best_move)
+        return 0
 
-            best_block.highlighted = False
-            self.renderer.draw(board, self.id)
+    def choose_move(self, board: Block) -> Optional[Move]:
+        """Search <board> and return the move this player would make, or
+        None if no move changes it.  <board> is left unchanged.
+        """
+        goals = self.goals if len(self.goals) > 1 else [self.goal]
+        me = self.id if len(self.goals) > 1 else 0
+        root = self._find(board.board_hash(), me, len(goals))
+        if root is None:
+            root = _Node(board, me, len(goals), self.rng)
+
+        deadline = time.perf_counter() + self.time_limit
+        iterations = 0
+        while root.untried or root.edges:
+            self._iterate(board, root, goals)
+            iterations += 1
+            if time.perf_counter() >= deadline or \
+                    iterations == self.max_iterations:
+                break
 
-        return 0
+        self._root = root
+        if not root.edges:
+            return None
+        move = max(root.edges, key=lambda m: root.edges[m].visits)
+        return Smash(move.path, self.rng) if isinstance(move, Smash) \
+            else move
+
+    def _find(self, board_hash: int, mover: int,
+              num_players: int) -> Optional['_Node']:
+        """Return the node of the kept tree for the board with <board_hash>
+        and <mover> to move, within one round of moves of its root, or None.
+        """
+        level = [] if self._root is None else [self._root]
+        for _ in range(num_players + 1):
+            following = []
+            for node in level:
+                if node.board_hash == board_hash and node.mover == mover:
+                    return node
+                for child in node.edges.values():
+                    if isinstance(child, _Chance):
+                        following.extend(child.outcomes.values())
+                    else:
+                        following.append(child)
+            level = following
+        return None
+
+    def _iterate(self, board: Block, root: '_Node',
+                 goals: List[Goal]) -> None:
+        """Run one iteration of the search from <root>, which is <board>,
+        and leave <board> unchanged.
+        """
+        applied = []
+        visited = [root]
+        node = root
+        while True:
+            if node.untried:
+                move = node.untried.pop()
+                move.apply(board)
+                applied.append(move)
+                child = _Node(board, (node.mover + 1) % len(goals),
+                              len(goals), self.rng)
+                if isinstance(move, Smash):
+                    chance = _Chance(len(goals))
+                    chance.outcomes[child.board_hash] = child
+                    node.edges[move] = chance
+                    visited.append(chance)
+                else:
+                    node.edges[move] = child
+                visited.append(child)
+                break
+            if not node.edges:
+                break
 
-    def _choose_random_block(self, board: Block) -> Block:
-        """Selecciona un bloque aleatorio en el tablero."""
-        max_depth = min(board.max_depth, 3)  # Limita la profundidad máxima
-        depth = random.randint(0, max_depth)
+            move, child = self._select(node)
+            if isinstance(child, _Chance):
+                move = Smash(move.path, self.rng)
+                move.apply(board)
+                chance = child
+                child = chance.outcomes.get(board.board_hash())
+                if child is None:
+                    child = _Node(board, (node.mover + 1) % len(goals),
+                                  len(goals), self.rng)
+                    chance.outcomes[child.board_hash] = child
+                visited.append(chance)
+            else:
+                move.apply(board)
+            applied.append(move)
+            visited.append(child)
+            node = child
+            if child.visits == 0:
+                break
 
-        current = board
-        for _ in range(depth):
-            if not current.children:  # Si es una hoja, terminar
+        rewards = self._rollout(board, goals, visited[-1].mover)
+        for entry in visited:
+            entry.visits += 1
+            for i, reward in enumerate(rewards):
+                entry.totals[i] += reward
+        for move in reversed(applied):
+            move.undo(board)
+
+    def _select(self, node: '_Node') -> Tuple[Move,
+                                              Union['_Node', '_Chance']]:
+        """Return the edge of <node> with the highest UCT value for the
+        player to move at <node>.
+        """
+        log_visits = math.log(node.visits)
+        best = None
+        best_value = float('-inf')
+        for move, child in node.edges.items():
+            value = child.totals[node.mover] / child.visits + \
+                self.exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best = move, child
+                best_value = value
+        return best
+
+    def _rollout(self, board: Block, goals: List[Goal],
+                 mover: int) -> List[float]:
+        """Play rollout_depth moves on <board> starting with player <mover>,
+        and return every player's final score, scaled to at most 1.
+        <board> is left unchanged.
+        """
+        applied = []
+        for _ in range(self.rollout_depth):
+            moves = generate_moves(board, True, self.rng)
+            if not moves:
                 break
-            current = random.choice(current.children)
+            if self.greedy:
+                sample = self.rng.sample(moves, min(len(moves), 8))
+                move = max(sample, key=lambda m: self.score_cache.score_after(
+                    goals[mover], board, m))
+            else:
+                move = self.rng.choice(moves)
+            move.apply(board)
+            applied.append(move)
+            mover = (mover + 1) % len(goals)
+
+        cells = 2 ** (board.max_depth - board.level)
+        scale = max(cells * cells, 4 * cells)
+        rewards = [self.score_cache.score(goal, board) / scale
+                   for goal in goals]
+        for move in reversed(applied):
+            move.undo(board)
+        return rewards
+
+
+class _OutOfTime(Exception):
+    """Raised when a SearchPlayer runs out of time in the middle of a
+    search.
+    """
+
 
-        return current
+class _Node:
+    """A board in the search tree of an MCTSPlayer.
+
+    === Public Attributes ===
+    board_hash:
+        The board hash of the board.
+    mover:
+        The index of the player to move on the board.
+    untried:
+        The moves of the board that have no edge yet.
+    edges:
+        The explored moves of the board, with the node they lead to, or
+        the chance node of a smash.
+    visits:
+        The number of iterations that went through this node.
+    totals:
+        The sum of each player's rewards over those iterations.
+    """
+    __slots__ = ('board_hash', 'mover', 'untried', 'edges', 'visits',
+                 'totals')
+    board_hash: int
+    mover: int
+    untried: List[Move]
+    edges: Dict[Move, Union['_Node', '_Chance']]
+    visits: int
+    totals: List[float]
+
+    def __init__(self, board: Block, mover: int, num_players: int,
+                 rng: random.Random) -> None:
+        """Initialize an unvisited node for <board> with <mover> to move,
+        whose moves are tried in an order shuffled by <rng>.
+        """
+        self.board_hash = board.board_hash()
+        self.mover = mover
+        self.untried = generate_moves(board, True, rng)
+        rng.shuffle(self.untried)
+        self.edges = {}
+        self.visits = 0
+        self.totals = [0.0] * num_players
+
+
+class _Chance:
+    """The random outcomes of a smash in the search tree of an MCTSPlayer.
+
+    === Public Attributes ===
+    outcomes:
+        The node of every board the smash led to, by board hash.
+    visits:
+        The number of iterations that went through this smash.
+    totals:
+        The sum of each player's rewards over those iterations.
+    """
+    __slots__ = ('outcomes', 'visits', 'totals')
+    outcomes: Dict[int, _Node]
+    visits: int
+    totals: List[float]
+
+    def __init__(self, num_players: int) -> None:
+        """Initialize an unvisited smash.
+        """
+        self.outcomes = {}
+        self.visits = 0
+        self.totals = [0.0] * num_players
+
+
+def _score_candidates(data: bytes, goal: Goal,
+                      moves: Sequence[Move]) -> List[int]:
+    """Return the score for <goal> after each of <moves> on the board stored
+    in the snapshot <data>.  This runs in a worker process.
+    """
+    board = snapshot.loads(data)
+    return [goal.score_after(board, move) for move in moves]
+
+
+def _action(path: Tuple[int, ...], action_type: int,
+            rng: Optional[random.Random] = None) -> Move:
+    """Return the move on the block at <path> that corresponds to
+    <action_type>: 0 and 1 rotate clockwise and counterclockwise, 2 and 3
+    swap horizontally and vertically, and 4 smashes, drawing from <rng>.
+    """
+    if action_type == 0:
+        return Rotate(path, CLOCKWISE)
+    elif action_type == 1:
+        return Rotate(path, COUNTERCLOCKWISE)
+    elif action_type == 2:
+        return Swap(path, HORIZONTAL)
+    elif action_type == 3:
+        return Swap(path, VERTICAL)
+    return Smash(path, rng)
 
 
 if __name__ == '__main__':
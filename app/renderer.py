@@ -8,35 +8,15 @@ University of Toronto
 
 === Module Description ===
 
-This file contains the Renderer class.
+This file contains the Renderer class.  The colours and board dimensions
+of the game are defined in the palette module and re-exported here.
 """
 from typing import List, Tuple
 import pygame
-
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-PACIFIC_POINT = (1, 128, 181)
-OLD_OLIVE = (138, 151, 71)
-REAL_RED = (199, 44, 58)
-MELON_MAMBO = (234, 62, 112)
-DAFFODIL_DELIGHT = (255, 211, 92)
-TEMPTING_TURQUOISE = (75, 196, 213)
-COLOUR_LIST = [PACIFIC_POINT, REAL_RED, OLD_OLIVE, DAFFODIL_DELIGHT]
-COLOUR_NAMES = ['Pacific Point', 'Real Red', 'Old Olive', 'Daffodil Delight']
-
-BOARD_WIDTH = 750
-BOARD_HEIGHT = 750
-TEXT_HEIGHT = 75
-
-
-def colour_name(colour: Tuple[int, int, int]) -> str:
-    """Return the colour name associated with this colour value, or
-    the empty string if this colour value isn't in our colour list.
-    """
-    for i in range(len(COLOUR_LIST)):
-        if COLOUR_LIST[i] == colour:
-            return COLOUR_NAMES[i]
-    return ''
+from app.palette import (WHITE, BLACK, PACIFIC_POINT, OLD_OLIVE, REAL_RED,
+                         MELON_MAMBO, DAFFODIL_DELIGHT, TEMPTING_TURQUOISE,
+                         COLOUR_LIST, COLOUR_NAMES, BOARD_WIDTH, BOARD_HEIGHT,
+                         TEXT_HEIGHT, colour_name)
 
 
 class Renderer:
@@ -51,11 +31,15 @@ class Renderer:
          The height and width of the rendering window, in pixels.
     player_labels:
          list of player icons to display
+    interactive:
+         True, since a Renderer shows the game to people, so players should
+         let them see each move.
     """
     displayed_image: pygame.Surface
     screen: pygame.Surface
     window_size: Tuple[int, int]
     player_labels: List[pygame.Surface]
+    interactive = True
 
     def __init__(self, num_players: int) -> None:
         """Initialize this renderer.
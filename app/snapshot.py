@@ -0,0 +1,242 @@
+"""Assignment 2 - Blocky
+
+=== Module Description ===
+
+This file contains a compact, versioned binary format for Blocky boards,
+and functions to write boards to files and read them back through mmap.
+
+A board record is laid out as follows (integers are little-endian):
+
+    magic         4 bytes   b'BLKY'
+    version       1 byte    FORMAT_VERSION
+    max_depth     1 byte
+    palette size  1 byte    k, at most 4
+    (padding)     1 byte
+    position      2 x i32   the (x, y) position of the top-level block
+    size          u32       the size of the top-level block
+    node bits     u32       the number of bits used by the tree
+    palette       k x 3 bytes of RGB
+    tree          the nodes in pre-order, packed most significant bit
+                  first: each node above max_depth starts with one bit that
+                  is 1 iff it is subdivided, and each undivided node then
+                  has two bits holding its colour's index in the palette.
+
+An archive packs many board records into one file:
+
+    magic         4 bytes   b'BLKA'
+    version       1 byte    FORMAT_VERSION
+    (padding)     3 bytes
+    count         u32       the number of boards, n
+    offsets       (n + 1) x u64, where board i occupies the bytes from
+                  offsets[i] to offsets[i + 1]
+    records       the board records, back to back
+"""
+import mmap
+import struct
+from typing import Iterator, List, Optional, Sequence, Tuple
+from app.block import Block
+from app.palette import COLOUR_LIST
+
+FORMAT_VERSION = 1
+
+_BOARD_MAGIC = b'BLKY'
+_ARCHIVE_MAGIC = b'BLKA'
+_BOARD_HEADER = struct.Struct('<4sBBBxiiII')
+_ARCHIVE_HEADER = struct.Struct('<4sBxxxI')
+_OFFSET = struct.Struct('<Q')
+
+
+def dumps(board: Block,
+          palette: Optional[Sequence[Tuple[int, int, int]]] = None) -> bytes:
+    """Return the binary record of the top-level Block <board>.
+
+    <palette> lists the colours that may appear on the board, and defaults
+    to COLOUR_LIST.  Raise a ValueError if it has more than four colours or
+    if <board> uses a colour that is not in it.
+    """
+    palette = list(COLOUR_LIST if palette is None else palette)
+    if len(palette) > 4:
+        raise ValueError('a palette holds at most four colours')
+    index = {colour: i for i, colour in enumerate(palette)}
+
+    bits = []
+    stack = [board]
+    while stack:
+        block = stack.pop()
+        if block.level < board.max_depth:
+            bits.append('1' if block.children else '0')
+        if block.children:
+            stack.extend(reversed(block.children))
+        elif block.colour in index:
+            bits.append(format(index[block.colour], '02b'))
+        else:
+            raise ValueError(f'colour {block.colour} is not in the palette')
+
+    tree = ''.join(bits)
+    num_bits = len(tree)
+    # Pad the bit string to whole bytes, keeping the first bit leftmost.
+    tree += '0' * (-num_bits % 8)
+    packed = int(tree, 2).to_bytes(len(tree) // 8, 'big') if tree else b''
+
+    x, y = board.position
+    header = _BOARD_HEADER.pack(_BOARD_MAGIC, FORMAT_VERSION,
+                                board.max_depth, len(palette),
+                                x, y, board.size, num_bits)
+    return header + bytes(c for colour in palette for c in colour) + packed
+
+
+def loads(data: bytes, offset: int = 0) -> Block:
+    """Return the top-level Block stored in the record starting at <offset>
+    within <data>, which may be any buffer, including an mmap.
+
+    The position and size of the top-level block are restored; those of
+    the other blocks are derived from them when they are first needed.
+    Raise a ValueError if <data> does not hold a valid record.
+    """
+    magic, version, max_depth, num_colours, x, y, size, num_bits = \
+        _BOARD_HEADER.unpack_from(data, offset)
+    if magic != _BOARD_MAGIC:
+        raise ValueError('not a Blocky board record')
+    if version != FORMAT_VERSION:
+        raise ValueError(f'unsupported board format version {version}')
+
+    start = offset + _BOARD_HEADER.size
+    raw_palette = bytes(data[start:start + 3 * num_colours])
+    palette = [tuple(raw_palette[i:i + 3])
+               for i in range(0, len(raw_palette), 3)]
+    start += 3 * num_colours
+    packed = bytes(data[start:start + (num_bits + 7) // 8])
+    tree = ''.join(format(byte, '08b') for byte in packed)
+
+    try:
+        board, end = _decode(tree, 0, 0, max_depth, palette)
+    except IndexError:
+        end = -1
+    if end != num_bits:
+        raise ValueError('corrupt Blocky board record')
+    board.update_block_locations((x, y), size)
+    return board
+
+
+def _decode(tree: str, start: int, level: int, max_depth: int,
+            palette: List[Tuple[int, int, int]]) -> Tuple[Block, int]:
+    """Return the Block at <level> encoded in <tree> from bit <start>
+    onwards, together with the index of the first bit after it.
+    """
+    subdivided = False
+    if level < max_depth:
+        subdivided = tree[start] == '1'
+        start += 1
+
+    if subdivided:
+        children = []
+        for _ in range(4):
+            child, start = _decode(tree, start, level + 1, max_depth, palette)
+            children.append(child)
+        block = Block(level, children=children)
+    else:
+        block = Block(level, palette[int(tree[start:start + 2], 2)])
+        start += 2
+    block.max_depth = max_depth
+    return block, start
+
+
+def dump(board: Block, path: str) -> None:
+    """Write the binary record of the top-level Block <board> to the file
+    at <path>.
+    """
+    with open(path, 'wb') as file:
+        file.write(dumps(board))
+
+
+def load(path: str) -> Block:
+    """Return the board stored by dump in the file at <path>.
+    """
+    with open(path, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return loads(data)
+
+
+def dump_many(boards: Sequence[Block], path: str) -> None:
+    """Write the top-level Blocks <boards> to an archive file at <path>.
+    """
+    records = [dumps(board) for board in boards]
+    offsets = []
+    position = _ARCHIVE_HEADER.size + _OFFSET.size * (len(records) + 1)
+    for record in records:
+        offsets.append(position)
+        position += len(record)
+    offsets.append(position)
+
+    with open(path, 'wb') as file:
+        file.write(_ARCHIVE_HEADER.pack(_ARCHIVE_MAGIC, FORMAT_VERSION,
+                                        len(records)))
+        file.write(b''.join(_OFFSET.pack(offset) for offset in offsets))
+        for record in records:
+            file.write(record)
+
+
+class Archive:
+    """A read-only, memory-mapped archive of boards written by dump_many.
+
+    Boards are only decoded when they are accessed.
+
+    === Private Attributes ===
+    _file:
+        The open archive file.
+    _data:
+        The memory map of the archive file.
+    _count:
+        The number of boards in the archive.
+    """
+    _file: object
+    _data: mmap.mmap
+    _count: int
+
+    def __init__(self, path: str) -> None:
+        """Open the archive stored in the file at <path>.
+
+        Raise a ValueError if the file is not a board archive.
+        """
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        magic, version, self._count = \
+            _ARCHIVE_HEADER.unpack_from(self._data, 0)
+        if magic != _ARCHIVE_MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError('not a supported Blocky board archive')
+
+    def __len__(self) -> int:
+        """Return the number of boards in this archive.
+        """
+        return self._count
+
+    def __getitem__(self, i: int) -> Block:
+        """Return the board at index <i> of this archive.
+        """
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError('board index out of range')
+        offset, = _OFFSET.unpack_from(
+            self._data, _ARCHIVE_HEADER.size + _OFFSET.size * i)
+        return loads(self._data, offset)
+
+    def __iter__(self) -> Iterator[Block]:
+        """Yield every board in this archive, in order.
+        """
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self) -> None:
+        """Release the memory map and the file of this archive.
+        """
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self) -> 'Archive':
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
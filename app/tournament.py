@@ -0,0 +1,187 @@
+"""Assignment 2 - Blocky
+
+=== Module Description ===
+
+This file contains a tournament runner, which plays many games between
+computer players across a pool of processes.
+
+A tournament plays every combination of a player configuration, a board
+depth and a seed.  A player configuration is a dictionary with any of the
+keys
+
+    'random':  the number of RandomPlayers
+    'smart':   the difficulty of each SmartPlayer
+    'search':  the number of plies of each SearchPlayer
+    'mcts':    the seconds per move of each MCTSPlayer
+
+whose players are seated in that order.  Games are played headless, and
+each finished game is written at once as one JSON line, so a tournament
+that was interrupted can be resumed from its results file.  A game that
+raises an exception is written as a line with an 'error' key instead, and
+is played again when the tournament is resumed.
+"""
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.game import Game
+from app.headless import NullRenderer
+
+PlayerConfig = Dict[str, object]
+GameKey = Tuple[str, int, int, int]
+
+
+def play_game(name: str, config: PlayerConfig, depth: int, seed: int,
+              turns: int) -> dict:
+    """Play one headless game of <turns> turns per player between the
+    players of <config>, called <name>, on a random board of <depth>
+    generated from <seed>, and return its result as a JSON-compatible
+    dictionary.
+    """
+    start = time.perf_counter()
+    game = Game(depth, 0, config.get('random', 0),
+                list(config.get('smart', [])),
+                list(config.get('search', [])),
+                renderer=NullRenderer(),
+                mcts_players=list(config.get('mcts', [])), seed=seed)
+    winner = game.run_game(turns, verbose=False)
+    return {
+        'config': name,
+        'players': config,
+        'depth': depth,
+        'seed': seed,
+        'turns': turns,
+        'goals': [[type(player.goal).__name__, list(player.goal.colour)]
+                  for player in game.players],
+        'turn_scores': [list(entry) for entry in game.turn_scores],
+        'final_scores': game.final_scores,
+        'winner': winner,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def completed_games(path: str) -> Set[GameKey]:
+    """Return the (configuration name, depth, seed, turns) of every game
+    recorded in the results file at <path>, or an empty set if there is no
+    such file.
+
+    A last line cut short by an interruption and games that failed are
+    ignored.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if 'error' in result:
+                continue
+            done.add((result['config'], result['depth'], result['seed'],
+                      result['turns']))
+    return done
+
+
+def run_tournament(configs: Dict[str, PlayerConfig], depths: Iterable[int],
+                   seeds: Iterable[int], path: str, turns: int = 5,
+                   workers: Optional[int] = None) -> int:
+    """Play every game of the tournament between <configs>, by name, on
+    boards of each of <depths> with each of <seeds>, with <workers>
+    processes (by default, one per CPU), and append a JSON line with the
+    result of each game to the file at <path> as soon as it finishes.
+
+    Games already recorded in the file with the same number of turns are
+    not played again.  A game that
+    raises an exception does not stop the others: a line recording its
+    configuration, depth, seed and error is written in place of its result.
+    Return the number of games played, including those that failed.
+    """
+    depths = list(depths)
+    seeds = list(seeds)
+    done = completed_games(path)
+    pending = [(name, config, depth, seed)
+               for name, config in configs.items()
+               for depth in depths for seed in seeds
+               if (name, depth, seed, turns) not in done]
+    if not pending:
+        return 0
+
+    _truncate_partial_line(path)
+    with ProcessPoolExecutor(workers) as pool, open(path, 'a') as file:
+        futures = {pool.submit(play_game, name, config, depth, seed, turns):
+                   (name, config, depth, seed)
+                   for name, config, depth, seed in pending}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                name, config, depth, seed = futures[future]
+                result = _failure(name, config, depth, seed, turns, error)
+            file.write(json.dumps(result) + '\n')
+            file.flush()
+    return len(pending)
+
+
+def _failure(name: str, config: PlayerConfig, depth: int, seed: int,
+             turns: int, error: Exception) -> dict:
+    """Return the record of the game of play_game(<name>, <config>, <depth>,
+    <seed>, <turns>) that failed with <error>, as a JSON-compatible
+    dictionary.
+
+    The traceback of a game played in a worker process includes the
+    traceback from that process.
+    """
+    return {
+        'config': name,
+        'players': config,
+        'depth': depth,
+        'seed': seed,
+        'turns': turns,
+        'error': ''.join(
+            traceback.format_exception_only(type(error), error)).strip(),
+        'traceback': ''.join(traceback.format_exception(
+            type(error), error, error.__traceback__)),
+    }
+
+
+def _truncate_partial_line(path: str) -> None:
+    """Remove a last line cut short by an interruption from the file at
+    <path>, if there is one, so that new results start on a line of their
+    own.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as file:
+        data = file.read()
+        if data and not data.endswith(b'\n'):
+            file.truncate(data.rfind(b'\n') + 1)
+
+
+def summarize(path: str) -> Dict[str, List[int]]:
+    """Return, for each configuration in the results file at <path>, how
+    many games each of its seats won.  Games that failed are left out.
+    """
+    wins = {}
+    with open(path) as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if 'error' in result:
+                continue
+            seats = wins.setdefault(result['config'],
+                                    [0] * len(result['final_scores']))
+            seats[result['winner']] += 1
+    return wins
+
+
+if __name__ == '__main__':
+    run_tournament({'smart-1-vs-5': {'smart': [1, 5]},
+                    'random-vs-search': {'random': 1, 'search': [2]}},
+                   depths=[3, 4], seeds=range(20), path='tournament.jsonl')
+    print(summarize('tournament.jsonl'))
@@ -0,0 +1,237 @@
+"""Assignment 2 - Blocky: Block tests
+
+=== Module Description ===
+
+This file contains tests for the caching and bookkeeping done by the Block
+class, beyond the sample tests in simple_test.py.
+"""
+import random
+import numpy as np
+from app.block import Block, HIGHLIGHT_COLOUR, random_init
+from app.renderer import COLOUR_LIST
+from tests.simple_test import construct_board
+
+
+def test_flatten_cache_follows_moves() -> None:
+    """flatten stays correct after moves, and only the mutated path is
+    rebuilt.
+    """
+    random.seed(148)
+    board = random_init(0, 5)
+    board.update_block_locations((0, 0), 750)
+    board.flatten()
+
+    target = board
+    while target.children and target.children[2].children:
+        target = target.children[2]
+    untouched = board.children[0]
+    untouched_grid = untouched._flatten_grid()
+
+    target.rotate(1)
+    assert untouched._flatten_grid() is untouched_grid
+    assert board._flattened is None
+    rebuilt = board.flatten()
+    target.rotate(3)
+    target.rotate(1)
+    assert board.flatten() == rebuilt
+
+
+def test_flatten_returns_copy() -> None:
+    """Mutating the result of flatten does not corrupt the cache.
+    """
+    board, expected = construct_board()
+    board.flatten()[0][0] = None
+    assert board.flatten() == expected
+
+
+def test_flatten_array() -> None:
+    """flatten_array holds the COLOUR_LIST index of every cell of flatten.
+    """
+    random.seed(507)
+    board = random_init(0, 5)
+    grid = board.flatten_array()
+    assert grid.shape == (32, 32) and grid.dtype == np.uint8
+    assert [[COLOUR_LIST[i] for i in column] for column in grid.tolist()] \
+        == board.flatten()
+
+
+def test_geometry_is_lazy() -> None:
+    """Moves leave descendants alone, and positions are recomputed when
+    they are read.
+    """
+    board, _ = construct_board()
+    board.update_block_locations((0, 0), 64)
+    grandchild = board.children[0].children[3]
+    assert (grandchild.position, grandchild.size) == ((48, 16), 16)
+    layout = grandchild._layout
+
+    board.rotate(1)
+    board.children[3].swap(1)
+    assert grandchild._layout == layout
+    assert (grandchild.position, grandchild.size) == ((48, 32), 16)
+    assert board.children[0].position == (32, 0)
+    assert board.get_selected_block((50, 40), 2) is grandchild
+
+
+def test_stale_subtree_laid_out_at_once() -> None:
+    """Reading the geometry of one Block after a move lays out the whole
+    out-of-date subtree above it, matching the rectangles drawn.
+    """
+    random.seed(12)
+    board = random_init(0, 5)
+    while len(board.children) == 0 or not board.children[2].children:
+        board = random_init(0, 5)
+    board.update_block_locations((0, 0), 512)
+    board.rotate(3)
+    board.children[2].children[0].position
+
+    stack = [board.children[2]]
+    while stack:
+        block = stack.pop()
+        assert block._layout == board._generation
+        stack.extend(block.children)
+    assert all(child._layout != board._generation
+               for child in board.children if child is not board.children[2])
+    drawn = {(position, size) for _, position, (size, _), _
+             in board.iter_rectangles()}
+    stack = [board]
+    while stack:
+        block = stack.pop()
+        if not block.children:
+            assert (block.position, block.size) in drawn
+        stack.extend(block.children)
+
+
+def test_board_hash() -> None:
+    """board_hash tracks moves and agrees with equal_boards.
+    """
+    board, _ = construct_board()
+    reference, _ = construct_board()
+    original = board.board_hash()
+    assert original == reference.board_hash()
+
+    board.children[0].rotate(1)
+    rotated = board.board_hash()
+    assert rotated != original
+    board.children[0].rotate(3)
+    assert board.board_hash() == original
+
+    board.swap(0)
+    assert board.board_hash() not in (original, rotated)
+    board.swap(0)
+    assert board.board_hash() == original
+
+    random.seed(148)
+    boards = [random_init(0, 4) for _ in range(200)]
+    assert len({b.board_hash() for b in boards}) == \
+        len({structure(b) for b in boards})
+
+
+def structure(b: Block) -> object:
+    """Return a hashable value that describes the structure and colours
+    of <b>.
+    """
+    if not b.children:
+        return b.colour
+    return tuple(structure(child) for child in b.children)
+
+
+def test_selected_blocks_batch() -> None:
+    """get_selected_blocks agrees with get_selected_block, including on the
+    pixels that odd sizes leave outside every child.
+    """
+    random.seed(1001)
+    board = random_init(0, 5)
+    board.update_block_locations((0, 0), 750)
+    queries = [((random.randint(-20, 770), random.randint(-20, 770)),
+                random.randint(0, 6)) for _ in range(500)]
+    queries += [((749, 10), 5), ((374, 374), 5), ((10, 749), 3)]
+    expected = [board.get_selected_block(location, level)
+                for location, level in queries]
+    assert board.get_selected_blocks(queries) == expected
+    assert all(block is reference_selected_block(board, location, level)
+               for block, (location, level) in zip(expected, queries))
+
+
+def reference_selected_block(b: Block, location, level: int) -> Block:
+    """Return the block selected at <location> and <level>, found by checking
+    the bounds of every child.
+    """
+    x, y = location
+    if not (b.position[0] <= x < b.position[0] + b.size and
+            b.position[1] <= y < b.position[1] + b.size):
+        return b
+    if b.level == level or not b.children:
+        return b
+    for child in b.children:
+        if (child.position[0] <= x < child.position[0] + child.size and
+                child.position[1] <= y < child.position[1] + child.size):
+            return reference_selected_block(child, location, level)
+    return b
+
+
+def test_rectangles_cache() -> None:
+    """rectangles_to_draw is replayed from the cache until the board, its
+    highlighting or its geometry changes, and iter_rectangles agrees.
+    """
+    random.seed(507)
+    board = random_init(0, 4)
+    board.update_block_locations((0, 0), 750)
+    first = board.rectangles_to_draw()
+    cached = board._draw_list((0, 0), 750)
+    assert board._draw_list((0, 0), 750) is cached
+    assert board.rectangles_to_draw() == first
+
+    block = board.get_selected_block((700, 700), 2)
+    block.highlighted = True
+    assert board._draw_list((0, 0), 750) is not cached
+    assert set(board.iter_rectangles()) == set(board.rectangles_to_draw())
+    assert len(board.rectangles_to_draw()) == len(first) + 1
+
+    board.rotate(1)
+    assert set(board.iter_rectangles()) == set(board.rectangles_to_draw())
+    board.update_block_locations((10, 10), 512)
+    assert set(board.iter_rectangles()) == set(board.rectangles_to_draw())
+    assert (HIGHLIGHT_COLOUR, block.position, (block.size, block.size), 5) \
+        in board.rectangles_to_draw()
+
+
+def test_redraw_after_move(monkeypatch) -> None:
+    """Redrawing after a move rebuilds only the draw lists along the path
+    of the moved block, without reading the geometry of every block.
+    """
+    random.seed(4)
+    board = random_init(0, 4)
+    while len(board.children) == 0 or not board.children[0].children:
+        board = random_init(0, 4)
+    board.update_block_locations((0, 0), 750)
+    board.rectangles_to_draw()
+    siblings = [child._rectangles[2] for child in board.children[1:]]
+
+    calls = []
+    refresh = Block._refresh_geometry
+    monkeypatch.setattr(Block, '_refresh_geometry',
+                        lambda block: calls.append(block) or refresh(block))
+    board.children[0].rotate(1)
+    assert set(board.rectangles_to_draw()) == set(board.iter_rectangles())
+    assert len(calls) <= 4
+    assert all(child._rectangles[2] is sibling
+               for child, sibling in zip(board.children[1:], siblings))
+
+
+def test_blob_summary_cache() -> None:
+    """Blob summaries are only rebuilt along the path of a mutated block.
+    """
+    random.seed(4)
+    board = random_init(0, 4)
+    while len(board.children) == 0 or not board.children[0].children:
+        board = random_init(0, 4)
+    colour = COLOUR_LIST[0]
+    summary = board.blob_summary(colour)
+    assert board.blob_summary(colour) is summary
+    sibling = board.children[1].blob_summary(colour)
+    moved = board.children[0]
+    moved.rotate(1)
+    assert board.children[1].blob_summary(colour) is sibling
+    assert board.blob_summary(colour) is not summary
+    assert board.blob_summary(colour).size == 16
@@ -0,0 +1,70 @@
+"""Assignment 2 - Blocky: Game tests
+
+=== Module Description ===
+
+This file contains tests checking that games are reproducible from their
+seeds.
+"""
+import random
+from app.block import random_init
+from app.game import Game
+from app.headless import NullRenderer
+
+
+def play(seed: int) -> Game:
+    """Return a finished headless game with random and smart players.
+    """
+    game = Game(4, 0, 2, [3], renderer=NullRenderer(), seed=seed)
+    game.run_game(6, verbose=False)
+    return game
+
+
+def test_random_init_stream() -> None:
+    """random_init only draws from the generator it is given.
+    """
+    random.seed(1)
+    first = random_init(0, 5, random.Random(25))
+    random.seed(2)
+    second = random_init(0, 5, random.Random(25))
+    assert first.board_hash() == second.board_hash()
+
+
+def test_game_depends_only_on_seed() -> None:
+    """Two games with the same seed play out identically, whatever the state
+    of the random module, and their players draw from separate streams.
+    """
+    random.seed(3)
+    first = play(2025)
+    random.seed(4)
+    random.random()
+    second = play(2025)
+    assert first.board.board_hash() == second.board.board_hash()
+    assert first.turn_scores == second.turn_scores
+    assert [(type(p.goal), p.goal.colour) for p in first.players] == \
+        [(type(p.goal), p.goal.colour) for p in second.players]
+    assert first.players[0].rng.random() != first.players[1].rng.random()
+
+
+def test_seed_from_random_module() -> None:
+    """Without a seed, a game takes its seed from the random module.
+    """
+    random.seed(5)
+    first = Game(3, 0, 1, [], renderer=NullRenderer())
+    random.seed(5)
+    second = Game(3, 0, 1, [], renderer=NullRenderer())
+    assert first.seed == second.seed
+    assert first.board.board_hash() == second.board.board_hash()
+
+
+def test_run_game_closes_pools() -> None:
+    """SmartPlayers with workers play the same game as without, and their
+    process pools are shut down when the game ends.
+    """
+    serial = Game(3, 0, 1, [2], renderer=NullRenderer(), seed=8)
+    parallel = Game(3, 0, 1, [2], renderer=NullRenderer(), seed=8,
+                    smart_workers=2)
+    assert parallel.players[1].workers == 2
+    assert serial.run_game(3, verbose=False) == \
+        parallel.run_game(3, verbose=False)
+    assert serial.turn_scores == parallel.turn_scores
+    assert parallel.players[1]._pool is None
@@ -0,0 +1,208 @@
+"""Assignment 2 - Blocky: Goal tests
+
+=== Module Description ===
+
+This file contains tests checking that the different ways of scoring a
+goal agree with each other.
+"""
+import random
+import numpy as np
+from app.block import Block, random_init
+from app.goal import (BlobGoal, PerimeterGoal, ScoreCache, score_goals,
+                      _components, _largest_blob, _merge_runs)
+from app.linear_board import LinearBoard
+from app.move import (Rotate, Swap, Smash, block_path, CLOCKWISE,
+                      COUNTERCLOCKWISE, HORIZONTAL, VERTICAL)
+from app.persistent import PersistentBlock
+from app.renderer import COLOUR_LIST
+
+
+def random_boards():
+    """Yield a fixed sequence of random boards of various depths.
+    """
+    random.seed(2017)
+    for depth in range(0, 8):
+        for _ in range(4):
+            yield random_init(0, depth)
+
+
+def test_score_array_matches_score() -> None:
+    """score_array on flatten_array gives the same result as scoring the
+    flattened board cell by cell.
+    """
+    for board in random_boards():
+        grid = board.flatten_array()
+        flattened = board.flatten()
+        for colour in COLOUR_LIST:
+            for goal in (BlobGoal(colour), PerimeterGoal(colour)):
+                expected = goal._score_flattened(flattened)
+                assert goal.score_array(grid) == expected
+                assert goal.score(board) == expected
+
+
+def test_backends_score_alike() -> None:
+    """A LinearBoard and a PersistentBlock converted from a Block score the
+    same as the Block for every goal.
+    """
+    goals = [goal(colour) for colour in COLOUR_LIST
+             for goal in (BlobGoal, PerimeterGoal)]
+    for board in random_boards():
+        expected = score_goals(board, goals)
+        for other in (LinearBoard.from_block(board),
+                      PersistentBlock.from_block(board)):
+            assert (other.flatten_array() == board.flatten_array()).all()
+            assert score_goals(other, goals) == expected
+            assert [goal.score(other) for goal in goals] == expected
+
+
+def test_blob_score_after_moves() -> None:
+    """BlobGoal.score stays correct as the board is mutated.
+    """
+    random.seed(99)
+    board = random_init(0, 5)
+    board.update_block_locations((0, 0), 640)
+    for _ in range(40):
+        block = board.get_selected_block(
+            (random.randrange(640), random.randrange(640)),
+            random.randint(0, 4))
+        action = random.randrange(3)
+        if action == 0:
+            block.rotate(random.choice([1, 3]))
+        elif action == 1:
+            block.swap(random.randint(0, 1))
+        else:
+            block.smash()
+        flattened = board.flatten()
+        for colour in COLOUR_LIST:
+            goal = BlobGoal(colour)
+            assert goal.score(board) == goal._score_flattened(flattened)
+
+
+def test_score_outside_palette() -> None:
+    """Boards with colours outside COLOUR_LIST are still scored.
+    """
+    other = (1, 2, 3)
+    board = Block(0, children=[Block(1, other), Block(1, COLOUR_LIST[0]),
+                               Block(1, other), Block(1, other)])
+    for child in board.children:
+        child.max_depth = 1
+    board.max_depth = 1
+    assert BlobGoal(other).score(board) == 3
+    assert PerimeterGoal(other).score(board) == 6
+
+
+def test_blob_score_on_deep_single_colour_board() -> None:
+    """A single-colour board is one blob, however deep the board is.
+    """
+    board = Block(0, COLOUR_LIST[0])
+    board.max_depth = 9
+    assert BlobGoal(COLOUR_LIST[0]).score(board) == 512 * 512
+    assert BlobGoal(COLOUR_LIST[1]).score(board) == 0
+    assert PerimeterGoal(COLOUR_LIST[0]).score(board) == 4 * 512
+
+
+def test_undiscovered_blob_size() -> None:
+    """_undiscovered_blob_size measures one blob and marks what it visited.
+    """
+    a, b = COLOUR_LIST[0], COLOUR_LIST[1]
+    board = [[a, a, b],
+             [b, a, b],
+             [a, b, a]]
+    visited = [[-1] * 3 for _ in range(3)]
+    goal = BlobGoal(a)
+    assert goal._undiscovered_blob_size((0, 0), board, visited) == 3
+    assert goal._undiscovered_blob_size((1, 1), board, visited) == 0
+    assert goal._undiscovered_blob_size((3, 0), board, visited) == 0
+    assert visited[0][:2] == [1, 1] and visited[1][1] == 1
+    assert visited[1][0] == 0 and visited[0][2] == 0
+    assert visited[2][2] == -1
+
+
+def test_score_after_matches_applying_the_move() -> None:
+    """score_after gives the score of the board after the move, and leaves
+    the board as it was.
+    """
+    random.seed(15)
+    board = random_init(0, 4)
+    board.update_block_locations((0, 0), 640)
+    for _ in range(60):
+        block = board.get_selected_block(
+            (random.randrange(640), random.randrange(640)),
+            random.randint(0, 4))
+        path = block_path(block)
+        move = random.choice([Rotate(path, CLOCKWISE),
+                              Rotate(path, COUNTERCLOCKWISE),
+                              Swap(path, HORIZONTAL), Swap(path, VERTICAL),
+                              Smash(path)])
+        before = board.board_hash()
+        for colour in COLOUR_LIST:
+            for goal in (BlobGoal(colour), PerimeterGoal(colour)):
+                predicted = goal.score_after(board, move)
+                assert board.board_hash() == before
+                if move.apply(board):
+                    assert predicted == goal._score_flattened(board.flatten())
+                    move.undo(board)
+        move.apply(board)
+
+
+def test_score_goals() -> None:
+    """score_goals agrees with scoring every goal on its own.
+    """
+    for board in random_boards():
+        goals = [goal_class(colour) for colour in COLOUR_LIST
+                 for goal_class in (BlobGoal, PerimeterGoal)]
+        assert score_goals(board, goals) == \
+            [goal.score(board) for goal in goals]
+
+
+def test_score_cache() -> None:
+    """ScoreCache returns the goal's scores, recognizes recurring boards and
+    evicts the least recently used score.
+    """
+    random.seed(17)
+    board = random_init(0, 3)
+    while not board.children:
+        board = random_init(0, 3)
+    cache = ScoreCache(capacity=2)
+    blob, perimeter = BlobGoal(COLOUR_LIST[0]), PerimeterGoal(COLOUR_LIST[0])
+    assert cache.score(blob, board) == blob.score(board)
+    assert cache.score(blob, board) == blob.score(board)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    move = Rotate((), CLOCKWISE)
+    expected = blob.score_after(board, move)
+    assert cache.score_after(blob, board, move) == expected
+    move.apply(board)
+    assert cache.score(blob, board) == expected
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    cache.score(perimeter, board)
+    assert cache.evictions == 1 and len(cache) == 2
+    Rotate((), COUNTERCLOCKWISE).apply(board)
+    cache.score(blob, board)
+    assert cache.misses == 4
+
+
+def test_components_on_serpentine() -> None:
+    """A blob winding through the whole grid is labelled in a few rounds,
+    with the same sizes as a flood fill.
+    """
+    n = 256
+    grid = np.ones((n, n), dtype=np.uint8)
+    grid[:, ::2] = 0
+    for col in range(1, n, 2):
+        grid[n - 1 if col % 4 == 1 else 0, col] = 0
+
+    colours, sizes = _components(grid)
+    for colour in (0, 1):
+        cells = [bool(cell == colour) for cell in grid.ravel()]
+        assert sizes[colours == colour].max() == _largest_blob(cells, n)
+    assert sizes[colours == 0].tolist() == [n * n // 2 + n // 2]
+
+    starts = np.ones(grid.shape, dtype=bool)
+    starts[:, 1:] = grid[:, 1:] != grid[:, :-1]
+    run_of_cell = np.cumsum(starts.ravel()) - 1
+    same = (grid[1:] == grid[:-1]).ravel()
+    _, rounds = _merge_runs(int(run_of_cell[-1]) + 1,
+                            run_of_cell[:-n][same], run_of_cell[n:][same])
+    assert rounds <= 3
@@ -0,0 +1,34 @@
+"""Assignment 2 - Blocky: headless tests
+
+=== Module Description ===
+
+This file contains tests for running the game without pygame or a window.
+"""
+import random
+import subprocess
+import sys
+import time
+from app.game import Game
+from app.headless import RecordingRenderer
+
+
+def test_game_logic_does_not_load_pygame() -> None:
+    """The board and goal modules can be imported without pygame.
+    """
+    code = ('import sys, app.block, app.goal, app.move, app.snapshot; '
+            'sys.exit("pygame" in sys.modules)')
+    assert subprocess.run([sys.executable, '-c', code]).returncode == 0
+
+
+def test_headless_game() -> None:
+    """A game of computer players with a non-interactive renderer runs
+    without drawing or waiting between moves.
+    """
+    random.seed(23)
+    renderer = RecordingRenderer()
+    game = Game(3, 0, 2, [1], [1], renderer=renderer)
+    start = time.perf_counter()
+    game.run_game(5)
+    assert time.perf_counter() - start < 5
+    assert renderer.frames == [(0, renderer.frames[0][1])]
+    assert len(game.journal) > 0
@@ -0,0 +1,98 @@
+"""Assignment 2 - Blocky: LinearBoard tests
+
+=== Module Description ===
+
+This file contains tests checking that LinearBoard behaves like the tree of
+Blocks it was converted from.
+"""
+import random
+from app.block import random_init
+from app.linear_board import LinearBoard, random_board
+from tests.simple_test import construct_board, equal_boards
+
+
+def test_round_trip() -> None:
+    """Converting a Block to a LinearBoard and back preserves the board.
+    """
+    random.seed(148)
+    for depth in range(1, 6):
+        block = random_init(0, depth)
+        block.update_block_locations((0, 0), 750)
+        linear = LinearBoard.from_block(block)
+        assert linear.flatten() == block.flatten()
+        assert linear.to_block().flatten() == block.flatten()
+        assert equal_boards(linear.to_block(), block)
+        assert set(linear.to_block().rectangles_to_draw()) == \
+            set(block.rectangles_to_draw())
+
+
+def test_moves_match_block() -> None:
+    """rotate and swap act on a LinearBoard exactly as they do on Blocks.
+    """
+    board, _ = construct_board()
+    linear = LinearBoard.from_block(board)
+
+    board.swap(0)
+    linear.swap((0, 0), 0)
+    assert linear.flatten() == board.flatten()
+
+    board.children[3].rotate(1)
+    linear.rotate(linear.children((0, 0))[3], 1)
+    assert linear.flatten() == board.flatten()
+
+    board.rotate(3)
+    linear.rotate((0, 0), 3)
+    board.swap(1)
+    linear.swap((0, 0), 1)
+    assert equal_boards(linear.to_block(), board)
+
+
+def test_smash() -> None:
+    """smash is only allowed below the root and above max_depth.
+    """
+    board, _ = construct_board()
+    linear = LinearBoard.from_block(board)
+    assert not linear.smash((0, 0))
+    assert not linear.smash((2, 1))
+    assert linear.smash((1, 0))
+    assert not linear.is_leaf((1, 0))
+
+
+def test_get_selected_block() -> None:
+    """get_selected_block finds the node matching Block.get_selected_block.
+    """
+    random.seed(1001)
+    block = random_init(0, 4)
+    block.update_block_locations((0, 0), 750)
+    linear = LinearBoard.from_block(block)
+    for location in [(0, 0), (749, 749), (374, 375), (500, 20), (-3, 9)]:
+        for level in range(5):
+            expected = block.get_selected_block(location, level)
+            node = linear.get_selected_block(location, level)
+            assert node[0] == expected.level
+            assert linear.geometry(node) == (expected.position, expected.size)
+
+
+def test_random_board() -> None:
+    """random_board generates the same board as random_init for one seed.
+    """
+    random.seed(507)
+    linear = random_board(5)
+    random.seed(507)
+    assert equal_boards(linear.to_block(), random_init(0, 5))
+
+
+def test_to_block_depths() -> None:
+    """Every Block built by to_block knows the depth of the board, so it
+    flattens to the same cells as the LinearBoard.
+    """
+    for depth in range(1, 6):
+        linear = random_board(depth, random.Random(depth))
+        block = linear.to_block()
+        stack = [block]
+        while stack:
+            b = stack.pop()
+            assert b.max_depth == depth
+            assert len(b.flatten()) == 2 ** (depth - b.level)
+            stack.extend(b.children)
+        assert block.flatten() == linear.flatten()
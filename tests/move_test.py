@@ -0,0 +1,103 @@
+"""Assignment 2 - Blocky: Move tests
+
+=== Module Description ===
+
+This file contains tests for the Move classes and the MoveJournal.
+"""
+import random
+from app.block import Block
+from app.move import (MoveJournal, Rotate, Swap, Smash, block_at, block_path,
+                      generate_moves, CLOCKWISE, COUNTERCLOCKWISE, HORIZONTAL,
+                      VERTICAL)
+from app.renderer import COLOUR_LIST
+from tests.simple_test import construct_board, equal_boards
+
+
+def test_block_path() -> None:
+    """block_path and block_at are inverses.
+    """
+    board, _ = construct_board()
+    grandchild = board.children[0].children[2]
+    assert block_path(grandchild) == (0, 2)
+    assert block_at(board, (0, 2)) is grandchild
+    assert block_path(board) == ()
+
+
+def test_undo_redo() -> None:
+    """Moves applied through a journal can be undone and redone.
+    """
+    random.seed(148)
+    board, _ = construct_board()
+    reference, _ = construct_board()
+    journal = MoveJournal()
+
+    assert journal.apply(board, Rotate((0,), CLOCKWISE))
+    assert journal.apply(board, Swap((), VERTICAL))
+    assert journal.apply(board, Smash((2,)))
+    assert not journal.apply(board, Smash(()))
+    assert len(journal) == 3
+    after = board.board_hash()
+
+    mark = 0
+    journal.rollback(board, mark)
+    assert equal_boards(board, reference)
+    assert journal.undo(board) is None
+
+    assert journal.redo(board) == Rotate((0,), CLOCKWISE)
+    journal.redo(board)
+    journal.redo(board)
+    assert board.board_hash() == after
+    assert journal.redo(board) is None
+
+
+def test_apply_clears_redo() -> None:
+    """Applying a new move forgets the moves that could be redone.
+    """
+    board, _ = construct_board()
+    journal = MoveJournal()
+    journal.apply(board, Swap((), VERTICAL))
+    journal.undo(board)
+    journal.apply(board, Rotate((), CLOCKWISE))
+    assert journal.redo(board) is None
+    assert journal.history() == [Rotate((), CLOCKWISE)]
+
+
+def test_permutation() -> None:
+    """Rotations and swaps report how they reorder children; smashes don't.
+    """
+    board, _ = construct_board()
+    for move in [Rotate((), CLOCKWISE), Rotate((), COUNTERCLOCKWISE),
+                 Swap((), HORIZONTAL), Swap((), VERTICAL)]:
+        children = list(board.children)
+        move.apply(board)
+        assert board.children == [children[i] for i in move.permutation()]
+    assert Smash((0,)).permutation() is None
+
+
+def test_generate_moves() -> None:
+    """generate_moves lists each distinct outcome once and no no-ops.
+    """
+    board, _ = construct_board()
+    moves = generate_moves(board)
+    assert len(moves) == len(set(moves))
+    for move in moves:
+        before = board.board_hash()
+        move.apply(board)
+        assert board.board_hash() != before
+        move.undo(board)
+    assert all(block_at(board, move.path).children for move in moves)
+
+    uniform = Block(0, children=[Block(1, COLOUR_LIST[0]) for _ in range(4)])
+    uniform.max_depth = 1
+    assert generate_moves(uniform) == []
+    assert generate_moves(uniform, smash=True) == []
+
+    outcomes = set()
+    for move in generate_moves(board):
+        move.apply(board)
+        outcomes.add(board.board_hash())
+        move.undo(board)
+    assert len(outcomes) == len(moves)
+    smashes = [move for move in generate_moves(board, smash=True)
+               if isinstance(move, Smash)]
+    assert {move.path for move in smashes} == {(0,), (1,), (2,), (3,)}
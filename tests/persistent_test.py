@@ -0,0 +1,82 @@
+"""Assignment 2 - Blocky: PersistentBlock tests
+
+=== Module Description ===
+
+This file contains tests checking that moves on a PersistentBlock match
+moves on a Block while leaving the original board untouched.
+"""
+import random
+import pytest
+from app.block import random_init
+from app.move import generate_moves
+from app.persistent import PersistentBlock
+from app.renderer import COLOUR_LIST
+from tests.simple_test import construct_board, equal_boards
+
+
+def test_moves_share_untouched_subtrees() -> None:
+    """rotate and swap return new boards that match the mutated Block and
+    share every subtree off the moved path.
+    """
+    board, _ = construct_board()
+    original = PersistentBlock.from_block(board)
+
+    rotated = original.rotate((0,), 1)
+    board.children[0].rotate(1)
+    assert equal_boards(rotated.to_block(), board)
+    assert rotated.board_hash() == board.board_hash()
+    assert rotated.flatten() == board.flatten()
+    assert all(rotated.children[i] is original.children[i]
+               for i in range(1, 4))
+    assert set(rotated.children[0].children) == \
+        set(original.children[0].children)
+
+    swapped = rotated.swap((), 0)
+    board.swap(0)
+    assert equal_boards(swapped.to_block(), board)
+    assert rotated.children[0] is swapped.children[1]
+
+    reference, _ = construct_board()
+    assert equal_boards(original.to_block(), reference)
+    assert original.rotate((1,), 1) is original
+
+
+def test_smash() -> None:
+    """smash leaves the original alone and respects the smash rules.
+    """
+    board, _ = construct_board()
+    original = PersistentBlock.from_block(board)
+    assert original.smash(()) is original
+    assert original.smash((0, 0)) is original
+
+    random.seed(148)
+    smashed = original.smash((1,))
+    assert len(smashed.children[1].children) == 4
+    assert not original.children[1].children
+
+
+def test_immutable() -> None:
+    """Attributes of a PersistentBlock cannot be reassigned.
+    """
+    board, _ = construct_board()
+    with pytest.raises(AttributeError):
+        PersistentBlock.from_block(board).colour = None
+
+
+def test_play_matches_block() -> None:
+    """play gives the board that applying the move to a Block gives, with
+    the same blob summaries, and to_block keeps max_depth everywhere.
+    """
+    random.seed(7)
+    board = random_init(0, 4)
+    original = PersistentBlock.from_block(board)
+    for move in generate_moves(board):
+        played = original.play(move)
+        move.apply(board)
+        assert played.board_hash() == board.board_hash()
+        assert played.to_block().flatten() == board.flatten()
+        for colour in COLOUR_LIST:
+            assert played.blob_summary(colour).largest() == \
+                board.blob_summary(colour).largest()
+        move.undo(board)
+    assert original.board_hash() == board.board_hash()
@@ -0,0 +1,246 @@
+"""Assignment 2 - Blocky: Player tests
+
+=== Module Description ===
+
+This file contains tests for the way computer players choose their moves.
+"""
+import random
+import time
+from app import snapshot
+from app.block import random_init
+from app.goal import BlobGoal, PerimeterGoal
+from app.headless import NullRenderer
+from app.move import Smash, block_at, generate_moves
+from app.player import MCTSPlayer, RandomPlayer, SearchPlayer, SmartPlayer
+from app.renderer import COLOUR_LIST
+
+
+def test_parallel_matches_serial() -> None:
+    """A SmartPlayer chooses the same move with or without workers.
+    """
+    random.seed(19)
+    board = random_init(0, 4)
+    candidates = generate_moves(board)
+    for goal in (BlobGoal(COLOUR_LIST[1]), PerimeterGoal(COLOUR_LIST[2])):
+        serial = SmartPlayer(None, 0, goal, 5)
+        parallel = SmartPlayer(None, 1, goal, 5, workers=3)
+        try:
+            before = board.board_hash()
+            assert parallel._best_move(board, candidates) == \
+                serial._best_move(board, candidates)
+            assert board.board_hash() == before
+        finally:
+            parallel.close()
+
+
+def brute_force(board, goals, mover, depth):
+    """Return the scores of all goals after max-n search over every
+    distinct move, without pruning, width limit or transpositions.
+    """
+    moves = generate_moves(board) if depth > 0 else []
+    best = None
+    for move in moves:
+        move.apply(board)
+        scores = brute_force(board, goals, (mover + 1) % len(goals),
+                             depth - 1)
+        move.undo(board)
+        if best is None or scores[mover] > best[mover]:
+            best = scores
+    return best or tuple(goal.score(board) for goal in goals)
+
+
+def test_search_player_alpha_beta() -> None:
+    """With two players, alpha-beta finds the move of a full search of the
+    score difference.
+    """
+    random.seed(20)
+    board = random_init(0, 3)
+    while not board.children:
+        board = random_init(0, 3)
+    goals = [BlobGoal(COLOUR_LIST[0]), PerimeterGoal(COLOUR_LIST[1])]
+    player = SearchPlayer(None, 0, goals[0], depth=2, width=1000,
+                          time_limit=None)
+    player.goals = goals
+    before = board.board_hash()
+    move = player.choose_move(board)
+    assert board.board_hash() == before
+
+    def difference(after_move):
+        after_move.apply(board)
+        worst = None
+        for reply in generate_moves(board) or [None]:
+            if reply is not None:
+                reply.apply(board)
+            value = goals[0].score(board) - goals[1].score(board)
+            if reply is not None:
+                reply.undo(board)
+            worst = value if worst is None else min(worst, value)
+        after_move.undo(board)
+        return worst
+
+    values = [difference(candidate) for candidate in generate_moves(board)]
+    assert difference(move) == max(values)
+
+
+def test_search_player_max_n() -> None:
+    """With three players, the search matches a full max-n search.
+    """
+    random.seed(21)
+    board = random_init(0, 2)
+    while not board.children:
+        board = random_init(0, 2)
+    goals = [BlobGoal(COLOUR_LIST[0]), PerimeterGoal(COLOUR_LIST[1]),
+             BlobGoal(COLOUR_LIST[2])]
+    player = SearchPlayer(None, 1, goals[1], depth=3, width=1000,
+                          time_limit=None)
+    player.goals = goals
+    move = player.choose_move(board)
+    move.apply(board)
+    found = brute_force(board, goals, 2, 2)
+    move.undo(board)
+    assert found[1] == brute_force(board, goals, 1, 3)[1]
+
+
+def test_search_player_time_limit() -> None:
+    """A SearchPlayer stops deepening when its time runs out, and makes the
+    move of the deepest search it completed.
+    """
+    random.seed(4)
+    board = random_init(0, 4)
+    while not board.children:
+        board = random_init(0, 4)
+    goals = [BlobGoal(COLOUR_LIST[0]), PerimeterGoal(COLOUR_LIST[1])]
+    player = SearchPlayer(None, 0, goals[0], depth=8, time_limit=0.2)
+    player.goals = goals
+    before = board.board_hash()
+    start = time.perf_counter()
+    move = player.choose_move(board)
+    assert time.perf_counter() - start < 0.2 + 0.1
+    assert board.board_hash() == before
+    assert 1 <= player.reached_depth < 8
+
+    deepest = SearchPlayer(None, 0, goals[0], depth=player.reached_depth,
+                           time_limit=None)
+    deepest.goals = goals
+    assert move == deepest.choose_move(board)
+
+
+def test_mcts_player() -> None:
+    """An MCTSPlayer respects its deadline, leaves the board unchanged, and
+    keeps the explored part of its tree for its next turn.
+    """
+    random.seed(21)
+    board = random_init(0, 3)
+    while not board.children:
+        board = random_init(0, 3)
+    goals = [BlobGoal(COLOUR_LIST[0]), PerimeterGoal(COLOUR_LIST[1])]
+    player = MCTSPlayer(None, 0, goals[0], time_limit=0.2)
+    player.goals = goals
+    before = board.board_hash()
+    start = time.perf_counter()
+    move = player.choose_move(board)
+    assert time.perf_counter() - start < 1.0
+    assert board.board_hash() == before
+    assert move in generate_moves(board, smash=True)
+
+    # Follow the most explored line of the tree for one round.
+    node = player._root
+    for _ in range(2):
+        move = max(node.edges, key=lambda m: node.edges[m].visits)
+        if isinstance(move, Smash):
+            return
+        move.apply(board)
+        node = node.edges[move]
+    assert player._find(board.board_hash(), 0, 2) is node
+
+
+def test_smart_player_time_budget() -> None:
+    """With a time budget, a SmartPlayer scores candidates until the
+    deadline and returns the best one found, or all of them if time allows.
+    """
+    random.seed(22)
+    board = random_init(0, 4)
+    while not board.children:
+        board = random_init(0, 4)
+    candidates = generate_moves(board)
+    goal = BlobGoal(COLOUR_LIST[3])
+    player = SmartPlayer(None, 0, goal, 0, time_budget=10.0)
+    move, evaluated = player._best_move_until(
+        board, candidates, time.perf_counter() + 10.0)
+    assert evaluated == len(candidates)
+    assert move == player._best_move(board, candidates)
+
+    move, evaluated = player._best_move_until(
+        board, candidates, time.perf_counter() - 1.0)
+    assert evaluated == 1 and move == candidates[0]
+
+
+def test_smart_player_best_first() -> None:
+    """Under a time budget, every distinct move is generated once, block by
+    block, from the most promising block down, with the moves already
+    scored in the cache first within their block.
+    """
+    random.seed(23)
+    board = random_init(0, 4)
+    while not board.children:
+        board = random_init(0, 4)
+    candidates = generate_moves(board)
+    goal = BlobGoal(COLOUR_LIST[0])
+    player = SmartPlayer(None, 0, goal, 0, time_budget=1.0)
+    scored = candidates[::3]
+    scores = {move: player.score_cache.score_after(goal, board, move)
+              for move in scored}
+
+    order = list(player._best_first(board, time.perf_counter() + 10.0))
+    assert sorted(map(repr, order)) == sorted(map(repr, candidates))
+    paths = []
+    for move in order:
+        if not paths or paths[-1] != move.path:
+            assert move.path not in paths
+            paths.append(move.path)
+    estimates = [goal.block_estimate(block_at(board, path), True)
+                 for path in paths[1:]]
+    assert estimates == sorted(estimates, reverse=True)
+    for path in paths:
+        moves = [move for move in order if move.path == path]
+        known = [scores[move] for move in moves if move in scores]
+        assert moves[:len(known)] == [move for move in moves
+                                      if move in scores]
+        assert known == sorted(known, reverse=True)
+
+    assert list(player._best_first(board, time.perf_counter() - 1.0)) == \
+        order[:len([move for move in order if move.path == ()])]
+
+
+def test_smart_player_hard_budget() -> None:
+    """A SmartPlayer with a time budget stays within it on a deep board.
+    """
+    random.seed(7)
+    board = random_init(0, 7)
+    for goal in (PerimeterGoal(COLOUR_LIST[1]), BlobGoal(COLOUR_LIST[1])):
+        # Blob summaries are built once per board and then kept up to date.
+        goal.score(board)
+        player = SmartPlayer(NullRenderer(), 0, goal, 0, time_budget=0.02)
+        for _ in range(3):
+            player.make_move(board)
+        for evaluated, seconds in player.turn_stats:
+            assert evaluated >= 1
+            assert seconds < 0.02 + 0.02
+
+
+def test_player_rng_follows_random_module() -> None:
+    """Players built outside a Game after the same random.seed make the
+    same moves.
+    """
+    random.seed(24)
+    board = random_init(0, 4)
+    goal = BlobGoal(COLOUR_LIST[0])
+    histories = []
+    for _ in range(2):
+        random.seed(25)
+        player = RandomPlayer(NullRenderer(), 0, goal)
+        copy = snapshot.loads(snapshot.dumps(board))
+        for _ in range(10):
+            player.make_move(copy)
+        histories.append(player.journal.history())
+    assert histories[0] == histories[1]
@@ -0,0 +1,60 @@
+"""Assignment 2 - Blocky: snapshot tests
+
+=== Module Description ===
+
+This file contains tests for the binary board format in app.snapshot.
+"""
+import random
+import pytest
+from app.block import random_init
+from app.snapshot import Archive, dump, dump_many, dumps, load, loads
+from tests.simple_test import construct_board, equal_boards
+
+
+def test_round_trip(tmp_path) -> None:
+    """A board survives being written to a file and loaded back.
+    """
+    random.seed(148)
+    board = random_init(0, 5)
+    board.update_block_locations((0, 0), 750)
+    path = str(tmp_path / 'board.blky')
+    dump(board, path)
+    loaded = load(path)
+
+    assert equal_boards(loaded, board)
+    assert loaded.max_depth == board.max_depth
+    assert loaded.board_hash() == board.board_hash()
+    assert loaded.flatten() == board.flatten()
+    assert set(loaded.rectangles_to_draw()) == set(board.rectangles_to_draw())
+
+
+def test_record_is_compact() -> None:
+    """The hand-made board needs 3 bits for its root and 2 bits per leaf.
+    """
+    board, _ = construct_board()
+    record = dumps(board)
+    # Header, 4-colour palette, then 9 nodes: 2 subdivided, 3 leaves at
+    # level 1 with a split bit, and 4 leaves at level 2 without one.
+    assert len(record) == 24 + 12 + (2 + 3 * 3 + 4 * 2 + 7) // 8
+    assert equal_boards(loads(record), board)
+
+
+def test_invalid_record() -> None:
+    """Loading something that is not a board record fails cleanly.
+    """
+    with pytest.raises(ValueError):
+        loads(b'\0' * 64)
+
+
+def test_archive(tmp_path) -> None:
+    """Boards packed into an archive can be read back individually.
+    """
+    random.seed(507)
+    boards = [random_init(0, depth % 5) for depth in range(12)]
+    path = str(tmp_path / 'boards.blka')
+    dump_many(boards, path)
+    with Archive(path) as archive:
+        assert len(archive) == len(boards)
+        assert equal_boards(archive[-1], boards[-1])
+        for loaded, board in zip(archive, boards):
+            assert equal_boards(loaded, board)
@@ -0,0 +1,94 @@
+"""Assignment 2 - Blocky: tournament tests
+
+=== Module Description ===
+
+This file contains tests for the tournament runner.
+"""
+import json
+from concurrent.futures import ProcessPoolExecutor
+from app.tournament import (completed_games, play_game, run_tournament,
+                            summarize)
+
+CONFIGS = {'random': {'random': 2}, 'smart': {'random': 1, 'smart': [2]}}
+
+
+def test_run_and_resume(tmp_path) -> None:
+    """Every game is recorded once, and an interrupted tournament only
+    plays the games that are missing.
+    """
+    path = str(tmp_path / 'results.jsonl')
+    assert run_tournament(CONFIGS, [2], [1, 2], path, turns=2,
+                          workers=2) == 4
+    with open(path) as file:
+        lines = file.readlines()
+    assert len(lines) == 4
+    assert completed_games(path) == {(name, 2, seed, 2) for name in CONFIGS
+                                     for seed in (1, 2)}
+
+    # Drop one game and leave half of its line, as if interrupted.
+    with open(path, 'w') as file:
+        file.writelines(lines[:3])
+        file.write(lines[3][:len(lines[3]) // 2])
+    assert run_tournament(CONFIGS, [2], [1, 2], path, turns=2,
+                          workers=2) == 1
+    with open(path) as file:
+        results = [json.loads(line) for line in file]
+    assert len(results) == 4
+    assert run_tournament(CONFIGS, [2], [1, 2], path, turns=2) == 0
+    assert run_tournament(CONFIGS, [2], [1], path, turns=3) == 2
+
+
+def test_generators(tmp_path) -> None:
+    """Depths and seeds may be given as generators.
+    """
+    path = str(tmp_path / 'results.jsonl')
+    assert run_tournament(CONFIGS, (depth for depth in [2, 3]),
+                          (seed for seed in [1, 2]), path, turns=1) == 8
+    assert len(completed_games(path)) == 8
+
+
+def test_play_game_is_reproducible() -> None:
+    """A game is determined by its configuration, depth and seed.
+    """
+    first = play_game('smart', CONFIGS['smart'], 3, 7, 3)
+    second = play_game('smart', CONFIGS['smart'], 3, 7, 3)
+    del first['seconds'], second['seconds']
+    assert first == second
+    assert len(first['turn_scores']) == 6
+    assert first['winner'] in (0, 1)
+
+
+def test_workers_match_serial() -> None:
+    """A game played in a worker process gives the same result as in this
+    process.
+    """
+    with ProcessPoolExecutor(2) as pool:
+        remote = pool.submit(play_game, 'random', CONFIGS['random'], 3, 11,
+                             4).result()
+    local = play_game('random', CONFIGS['random'], 3, 11, 4)
+    del remote['seconds'], local['seconds']
+    assert remote == local
+
+
+def test_failing_game(tmp_path) -> None:
+    """A game that raises is recorded with its error, the other games are
+    still played, and the failed game is played again on resume.
+    """
+    path = str(tmp_path / 'results.jsonl')
+    configs = {'random': CONFIGS['random'], 'broken': {'random': 'two'}}
+    assert run_tournament(configs, [2], [1, 2], path, turns=2,
+                          workers=2) == 4
+    with open(path) as file:
+        results = [json.loads(line) for line in file]
+    failed = [result for result in results if 'error' in result]
+    assert len(results) == 4 and len(failed) == 2
+    assert {(result['config'], result['seed']) for result in failed} == \
+        {('broken', 1), ('broken', 2)}
+    assert failed[0]['players'] == {'random': 'two'}
+    assert failed[0]['error'].startswith('TypeError')
+    assert 'play_game' in failed[0]['traceback']
+    assert completed_games(path) == {('random', 2, 1, 2),
+                                     ('random', 2, 2, 2)}
+    assert list(summarize(path)) == ['random']
+
+    assert run_tournament(configs, [2], [1, 2], path, turns=2) == 2